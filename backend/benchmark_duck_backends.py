@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Duck Backend Benchmark - Compare generation backends through one interface
+
+Drives each DuckBackend's hatch() directly and reports latency percentiles,
+throughput and mean per-stage timings. By default the expensive parts are
+stubbed locally so only each backend's own overhead is measured:
+
+- mcp:     stub Nova Canvas MCP server subprocess (stub_nova_canvas_mcp.py)
+           driven by a stub agent in place of Nova Pro
+- bedrock: StubBedrockRuntime in place of the bedrock-runtime client
+
+Pass --live to benchmark against real AWS instead.
+
+Usage:
+    python3 benchmark_duck_backends.py --requests 20 --concurrency 4 --stub-latency 0.5
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+from mcp import StdioServerParameters, stdio_client
+from strands.tools.mcp import MCPClient
+
+from duck_backends import BedrockCanvasDuckBackend, McpAgentDuckBackend, StubBedrockRuntime, settle_pond_writer
+from duck_deadline import HatchWatch
+from duck_traffic import DuckFootprints
+from replay_duck_traffic import quack_percentile
+
+BENCHMARK_PROMPT = "a duck wearing sunglasses and a leather jacket, cool vibes, digital art"
+
+STUB_MCP_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stub_nova_canvas_mcp.py')
+
+
+class StubCanvasAgent:
+    """Stand-in for the Nova Pro agent: calls generate_image once with the prompt as given"""
+
+    def __init__(self, mcp_client, workspace_dir):
+        self.mcp_client = mcp_client
+        self.workspace_dir = workspace_dir
+        self.messages = []
+
+    def __call__(self, agent_prompt):
+        prompt = agent_prompt.split("\n")[0].removeprefix("Create an image: ")
+        clutch = re.search(r"number_of_images to (\d+)", agent_prompt)
+        tool_input = {
+            "prompt": prompt,
+            "workspace_dir": self.workspace_dir,
+            "number_of_images": int(clutch.group(1)) if clutch else 1,
+        }
+        result = self.mcp_client.call_tool_sync("stub-generate", "generate_image", tool_input)
+        # Record the call the way a Strands agent does, so the clutch can be read back
+        self.messages = [
+            {"role": "assistant", "content": [
+                {"toolUse": {"toolUseId": "stub-generate", "name": "generate_image", "input": tool_input}}
+            ]},
+            {"role": "user", "content": [{"toolResult": result}]},
+        ]
+        return result
+
+    def cancel(self):
+        pass
+
+
+class StubbedMcpDuckBackend(McpAgentDuckBackend):
+    """MCP backend wired to the stub MCP server and stub agent"""
+
+    def __init__(self, workspace_dir, stub_latency):
+        def summon_stub_client():
+            return MCPClient(lambda: stdio_client(StdioServerParameters(
+                command=sys.executable,
+                args=[STUB_MCP_SERVER, '--latency', str(stub_latency)],
+            )))
+
+        super().__init__(summon_stub_client, model=None, system_prompt=None, workspace_dir=workspace_dir)
+
+    def summon_agent(self, mcp_client, tools):
+        return StubCanvasAgent(mcp_client, self.workspace_dir)
+
+
+def summon_benchmark_backend(name, live, stub_latency, workspace_dir):
+    """Create the named backend, stubbed unless live"""
+    output_dir = os.path.join(workspace_dir, 'output')
+    if name == 'mcp':
+        if live:
+            # Only live runs need the real agent configuration (and the Flask app module)
+            from duck_agent import SYSTEM_PROMPT, bedrock_model, summon_nova_canvas_client
+            return McpAgentDuckBackend(summon_nova_canvas_client, bedrock_model, SYSTEM_PROMPT)
+        return StubbedMcpDuckBackend(workspace_dir, stub_latency)
+    if name == 'bedrock':
+        client = None if live else StubBedrockRuntime(latency_s=stub_latency)
+        return BedrockCanvasDuckBackend(client=client, output_dir=output_dir)
+    raise ValueError(f"Unknown backend: {name!r}")
+
+
+def time_one_hatch(backend, clutch_size):
+    """Hatch one duck and return its latency, stage timings and success"""
+    footprints = DuckFootprints()
+    watch = HatchWatch(600)
+    started = time.perf_counter()
+    try:
+        image_data = backend.hatch(BENCHMARK_PROMPT, clutch_size, footprints, watch)
+        error = None if image_data else "no image"
+    except Exception as e:
+        error = str(e)
+    return {
+        "latency_ms": (time.perf_counter() - started) * 1000,
+        "stages_ms": footprints.stages_ms,
+        "error": error,
+    }
+
+
+def benchmark_backend(backend, requests, concurrency, clutch_size):
+    """Run requests hatches with the given concurrency and summarize them"""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: time_one_hatch(backend, clutch_size), range(requests)))
+    elapsed = time.perf_counter() - started
+    settle_pond_writer()
+
+    latencies = sorted(r['latency_ms'] for r in results if not r['error'])
+    stage_totals = {}
+    for result in results:
+        for stage, ms in result['stages_ms'].items():
+            stage_totals.setdefault(stage, []).append(ms)
+
+    return {
+        "succeeded": len(latencies),
+        "failed": len(results) - len(latencies),
+        "errors": sorted({r['error'] for r in results if r['error']}),
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": quack_percentile(latencies, 50),
+        "p95": quack_percentile(latencies, 95),
+        "max": latencies[-1] if latencies else None,
+        "stages": {stage: sum(ms) / len(ms) for stage, ms in stage_totals.items()},
+    }
+
+
+def main():
+    """Main benchmark function"""
+    parser = argparse.ArgumentParser(description="Benchmark duck generation backends")
+    parser.add_argument('--backend', action='append', choices=['mcp', 'bedrock'],
+                        help="Backend(s) to benchmark (default: both)")
+    parser.add_argument('--requests', type=int, default=20, help="Hatches per backend")
+    parser.add_argument('--concurrency', type=int, default=1, help="Hatches in flight at once")
+    parser.add_argument('--clutch', type=int, default=1, help="Images requested per hatch")
+    parser.add_argument('--stub-latency', type=float, default=0.0, help="Simulated model latency in seconds")
+    parser.add_argument('--live', action='store_true', help="Use real AWS instead of local stubs")
+    args = parser.parse_args()
+
+    print("\n" + "="*60)
+    print("🦆 DUCK BACKEND BENCHMARK")
+    print("="*60)
+    print(f"📊 {args.requests} hatches per backend, concurrency {args.concurrency}, clutch {args.clutch}")
+    print(f"🔧 Mode: {'live AWS' if args.live else f'local stubs ({args.stub_latency}s model latency)'}")
+    print("="*60 + "\n")
+
+    for name in args.backend or ['mcp', 'bedrock']:
+        with tempfile.TemporaryDirectory(prefix='duck-bench-') as workspace_dir:
+            backend = summon_benchmark_backend(name, args.live, args.stub_latency, workspace_dir)
+            summary = benchmark_backend(backend, args.requests, args.concurrency, args.clutch)
+
+        stages = ", ".join(f"{stage}={ms:.1f}" for stage, ms in summary['stages'].items())
+        print(f"🦆 {name}")
+        print(f"   ✅ {summary['succeeded']} ok, ❌ {summary['failed']} failed, "
+              f"{summary['throughput_rps']:.2f} ducks/s")
+        if summary['succeeded']:
+            print(f"   ⏱️  p50={summary['p50']:.1f} ms p95={summary['p95']:.1f} ms max={summary['max']:.1f} ms")
+        print(f"   📈 mean stage ms: {stages}")
+        for error in summary['errors']:
+            print(f"   ⚠️ {error}")
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Shared pytest fixtures for Duck Generator backend tests
+
+Flask test client, a temporary pond, stub generation backends and a
+throttled Strands model.
+"""
+
+import pytest
+from strands.models import Model
+from strands.types.exceptions import ModelThrottledException
+import duck_agent
+from duck_backends import BedrockCanvasDuckBackend, StubBedrockRuntime
+
+FAKE_PNG = b'\x89PNG fake duck'
+
+
+class ThrottledModel(Model):
+    """Strands model that is throttled a few times before it quacks back"""
+
+    def __init__(self, throttles):
+        self.throttles = throttles
+        self.calls = 0
+
+    def update_config(self, **model_config):
+        pass
+
+    def get_config(self):
+        return {}
+
+    def structured_output(self, *args, **kwargs):
+        raise NotImplementedError
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs):
+        self.calls += 1
+        if self.calls <= self.throttles:
+            raise ModelThrottledException("Quack! Slow down")
+        yield {"messageStart": {"role": "assistant"}}
+        yield {"contentBlockDelta": {"delta": {"text": "Quack!"}}}
+        yield {"contentBlockStop": {}}
+        yield {"messageStop": {"stopReason": "end_turn"}}
+
+
+@pytest.fixture
+def throttled_model():
+    """Factory for a model throttled the given number of times"""
+    return ThrottledModel
+
+
+@pytest.fixture
+def client():
+    """Create a test client for the Flask app"""
+    duck_agent.app.config['TESTING'] = True
+    with duck_agent.app.test_client() as client:
+        yield client
+
+
+@pytest.fixture
+def fake_png():
+    """Bytes of a tiny stand-in duck image"""
+    return FAKE_PNG
+
+
+@pytest.fixture
+def pond(tmp_path):
+    """Temporary pond directory for persisted ducks"""
+    return str(tmp_path / 'output')
+
+
+@pytest.fixture
+def stub_backend(pond):
+    """In-process backend on the Bedrock stub, persisting to the temporary pond"""
+    return BedrockCanvasDuckBackend(client=StubBedrockRuntime(image_bytes=FAKE_PNG), output_dir=pond)
+
+
+@pytest.fixture
+def stubbed_app(stub_backend, monkeypatch):
+    """Make the Flask app generate with the stub backend"""
+    monkeypatch.setattr(duck_agent, 'duck_backend', stub_backend)
+    return stub_backend
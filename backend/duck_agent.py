@@ -6,36 +6,94 @@ Pre-configured for the re:Invent booth challenge.
 """
 
 from mcp import StdioServerParameters, stdio_client
-from strands import Agent
-from strands.models import BedrockModel
 from strands.tools.mcp import MCPClient
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g, stream_with_context
 from flask_cors import CORS
+from contextlib import contextmanager
+from duck_backends import BedrockCanvasDuckBackend, McpAgentDuckBackend, StubCanvasDuckBackend
+from duck_bedrock import summon_bedrock_model
+from duck_deadline import DuckCancelled, HatchWatch, await_hatching
+from duck_ledger import DuckLedgerIndex
+from duck_metrics import pond_metrics
+from duck_traffic import DuckFootprints, DuckTrafficRecorder
+from functools import lru_cache
 import base64
+import json
 import os
 import glob
+import math
 import random
+import select
+import socket
+import threading
 
 app = Flask(__name__)
 CORS(app)
 
-# Initialize Nova Canvas MCP Client
-nova_canvas_client = MCPClient(
-    lambda: stdio_client(
-        StdioServerParameters(
-            command="uvx", 
-            args=["awslabs.nova-canvas-mcp-server@latest"]
-        )
+# Server-side deadline for a whole generation, kept under the frontend's
+# 30 second DUCK_HATCH_TIMEOUT so a fallback duck can still be returned in time
+HATCH_DEADLINE = float(os.environ.get('DUCK_HATCH_DEADLINE', 27))
+
+# Per-stage timeouts (seconds); the overall deadline always applies as well
+STAGE_TIMEOUTS = {
+    'mcp_startup': float(os.environ.get('DUCK_MCP_STARTUP_TIMEOUT', 10)),
+    'agent': float(os.environ.get('DUCK_AGENT_TIMEOUT', 25)),
+    'extract': float(os.environ.get('DUCK_EXTRACT_TIMEOUT', 5)),
+    'canvas': float(os.environ.get('DUCK_CANVAS_TIMEOUT', 20)),
+}
+
+# Generation backend: "mcp" (Nova Pro agent + Nova Canvas MCP server),
+# "bedrock" (in-process Nova Canvas call, images kept in memory) or
+# "stub" (canned ducks after DUCK_STUB_LATENCY seconds, no AWS; for replay)
+DUCK_BACKEND = os.environ.get('DUCK_BACKEND', 'mcp')
+STUB_LATENCY = float(os.environ.get('DUCK_STUB_LATENCY', 0))
+
+# In-process backend only: also write returned ducks to the pond (in the background)
+PERSIST_DUCKS = os.environ.get('DUCK_PERSIST_DUCKS', '1') != '0'
+
+
+def summon_nova_canvas_client():
+    """
+    Create a Nova Canvas MCP client
+    
+    Each generation gets its own client (and uvx subprocess) so concurrent
+    requests don't fight over a single MCP session.
+    """
+    return MCPClient(
+        lambda: stdio_client(
+            StdioServerParameters(
+                command="uvx", 
+                args=["awslabs.nova-canvas-mcp-server@latest"]
+            )
+        ),
+        # MCPClient takes whole seconds; round up so sub-second settings never become 0
+        startup_timeout=max(1, math.ceil(STAGE_TIMEOUTS['mcp_startup']))
     )
-)
+
 
 # Configure Bedrock Model
-# Using Amazon Nova Pro for duck generation
-bedrock_model = BedrockModel(
+# Using Amazon Nova Pro for duck generation, on the shared pooled Bedrock client
+bedrock_model = summon_bedrock_model(
     model_id="us.amazon.nova-pro-v1:0",
     temperature=0.7,
 )
 
+# Images requested per Nova Canvas call (1-5). The first is returned to the user;
+# extras stay in the output pond as fallback ducks, tagged with their prompt.
+IMAGES_PER_CALL = max(1, min(5, int(os.environ.get('DUCK_IMAGES_PER_CALL', 1))))
+
+# Surplus images are only requested while at most this many generations are in flight
+SURPLUS_MAX_IN_FLIGHT = int(os.environ.get('DUCK_SURPLUS_MAX_IN_FLIGHT', 1))
+
+_waddling_lock = threading.Lock()
+_waddling_ducks = 0
+
+# Prompt index of the pond ledger, for instant stream previews
+duck_ledger_index = DuckLedgerIndex()
+
+# Opt-in traffic capture (set DUCK_CAPTURE_LOG to enable)
+traffic_recorder = DuckTrafficRecorder.from_env()
+
 # Get absolute path to backend directory (Nova Canvas will append "output" to this)
 BACKEND_DIR = os.path.abspath(os.path.dirname(__file__))
 
@@ -69,6 +127,41 @@ def quack_pond_status():
     return jsonify({"status": "healthy", "message": "Quack! Duck generator is ready!"})
 
 
+@app.route('/api/duck/metrics', methods=['GET'])
+def count_pond_ducks():
+    """
+    Count what has been happening in the duck pond
+    
+    Returns the in-process counters (started, completed and cancelled
+    generations, broken down by cancellation reason and stage).
+    """
+    return jsonify(pond_metrics.snapshot())
+
+
+@app.after_request
+def stamp_duck_footprints(response):
+    """
+    Stamp the duck's footprints into the traffic log
+    
+    Writes the capture record for a generate request once its response
+    status is known. Does nothing unless traffic capture is enabled.
+    """
+    footprints = g.pop('duck_footprints', None)
+    if footprints is not None:
+        record_duck_footprints(footprints, response.status_code)
+    return response
+
+
+def record_duck_footprints(footprints, status_code):
+    """Append a request's footprints to the traffic log, if capture is enabled"""
+    if traffic_recorder is None:
+        return
+    try:
+        traffic_recorder.record_footprints(footprints, status_code)
+    except Exception as e:
+        print(f"⚠️ Failed to record duck footprints: {e}")
+
+
 @app.route('/api/duck/generate', methods=['POST'])
 def waddle_hatch_duck():
     """
@@ -89,70 +182,41 @@ def waddle_hatch_duck():
         "is_fallback": false
     }
     """
+    footprints = g.duck_footprints = DuckFootprints(endpoint=request.path)
+    
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True)
         
-        if not data or 'description' not in data:
-            return jsonify({
-                "error": "Quack! Please provide a duck description.",
-                "message": "Missing 'description' field in request",
-                "success": False
-            }), 400
-        
-        description = data['description'].strip()
-        
-        # Validate description length
-        if not description:
-            return jsonify({
-                "error": "Quack! Please describe your duck before we start hatching.",
-                "message": "Empty description provided",
-                "success": False
-            }), 400
-        
-        if len(description) > 1024:
-            return jsonify({
-                "error": "Quack! That's too much duck description. Keep it under 1024 characters!",
-                "message": "Description exceeds maximum length of 1024 characters",
-                "success": False
-            }), 400
+        description, rejection = inspect_duck_description(data)
+        footprints.description = description
+        if rejection:
+            return rejection
         
         # Enhance description to include "duck" if not present
-        enhanced_description = quack_enhance_prompt(description)
+        with footprints.waddle_stage('enhance'):
+            enhanced_description = quack_enhance_prompt(description)
         
         # Try to generate duck using the agent
-        image_data = None
         is_fallback = False
-        generation_error = None
         
         try:
-            with nova_canvas_client:
-                all_tools = nova_canvas_client.list_tools_sync()
-                agent = Agent(
-                    tools=all_tools, 
-                    model=bedrock_model, 
-                    system_prompt=SYSTEM_PROMPT
-                )
-                
-                # Ask agent to create the duck
-                print(f"🦆 Original description: {description}")
-                print(f"🦆 Enhanced description: {enhanced_description}")
-                response = agent(f"Create an image: {enhanced_description}")
-                print(f"✅ Agent response received")
-                
-                # Extract image from response
-                image_data = pluck_duck_from_pond(response)
-                print(f"✅ Image data extracted: {len(image_data) if image_data else 0} chars")
-                
-        except Exception as gen_error:
-            generation_error = str(gen_error)
-            print(f"⚠️ Generation failed: {gen_error}")
-            print("🔄 Attempting to use fallback duck...")
-            image_data = None
+            image_data, generation_error = hatch_duck_before_deadline(
+                description, enhanced_description, footprints
+            )
+        except DuckCancelled as cancelled:
+            # Nobody is waiting for this duck any more
+            return jsonify({
+                "error": "Quack! The duckling wandered off before hatching.",
+                "message": str(cancelled),
+                "success": False
+            }), 499
         
         # If generation failed, use a fallback duck
         if not image_data:
             print("🔄 Fetching fallback duck...")
-            image_data = fetch_backup_duckling()
+            note_fallback_reason(footprints, generation_error)
+            with footprints.waddle_stage('fallback'):
+                image_data = fetch_backup_duckling()
             is_fallback = True
             
             if image_data:
@@ -188,7 +252,10 @@ def waddle_hatch_duck():
         
         # Last resort: try fallback duck
         print("🔄 Last resort: attempting fallback duck...")
-        fallback = fetch_backup_duckling()
+        footprints.fallback_reason = "unhandled_error"
+        footprints.error = str(e)
+        with footprints.waddle_stage('fallback'):
+            fallback = fetch_backup_duckling()
         if fallback:
             print("✅ Last resort fallback successful")
             return jsonify({
@@ -206,6 +273,290 @@ def waddle_hatch_duck():
         }), 500
 
 
+@app.route('/api/duck/generate/stream', methods=['POST'])
+def waddle_stream_duck():
+    """
+    Waddle over and hatch a duck, streaming progress as it happens
+    
+    Streaming variant of /api/duck/generate with the same request body.
+    Responds with NDJSON (one JSON event per line), each sent as soon as
+    it is ready:
+    
+    {"event": "prompt", "prompt_used": "...", "message": "..."}
+    {"event": "preview", "image": "data:image/png;base64,...", "preview_prompt": "...", "is_fallback": true}
+    {"event": "image", "image": "data:image/png;base64,...", "message": "...",
+     "prompt_used": "...", "is_fallback": false, "success": true}
+    
+    The preview is the pond duck whose prompt best matches (or a random
+    fallback duck). If generation fails, the final image event carries the
+    preview duck with is_fallback true; with no duck at all, an
+    {"event": "error", ...} line is sent instead.
+    """
+    footprints = DuckFootprints(endpoint=request.path)
+    data = request.get_json(silent=True)
+    
+    description, rejection = inspect_duck_description(data)
+    footprints.description = description
+    if rejection:
+        g.duck_footprints = footprints
+        return rejection
+    
+    def quack_stream():
+        record_status = 200
+        try:
+            with footprints.waddle_stage('enhance'):
+                enhanced_description = quack_enhance_prompt(description)
+            yield quack_line({
+                "event": "prompt",
+                "prompt_used": enhanced_description,
+                "message": "Quack! Your duck is hatching..."
+            })
+            
+            with footprints.waddle_stage('preview'):
+                preview, preview_prompt = fetch_nearest_duckling(enhanced_description)
+            if preview:
+                yield quack_line({
+                    "event": "preview",
+                    "image": preview,
+                    "preview_prompt": preview_prompt,
+                    "is_fallback": True
+                })
+            
+            try:
+                image_data, generation_error = hatch_duck_before_deadline(
+                    description, enhanced_description, footprints
+                )
+            except DuckCancelled:
+                return
+            
+            if image_data:
+                yield quack_line({
+                    "event": "image",
+                    "image": image_data,
+                    "message": "Quack quack! Your duck is ready!",
+                    "prompt_used": enhanced_description,
+                    "is_fallback": False,
+                    "success": True
+                })
+            elif preview:
+                note_fallback_reason(footprints, generation_error)
+                yield quack_line({
+                    "event": "image",
+                    "image": preview,
+                    "message": "Quack! Here's a pre-made duck for you!",
+                    "prompt_used": enhanced_description,
+                    "is_fallback": True,
+                    "success": True
+                })
+            else:
+                record_status = 500
+                yield quack_line({
+                    "event": "error",
+                    "error": "Quack! The duck pond is having trouble right now. Please try again in a moment.",
+                    "message": f"Generation failed: {generation_error}" if generation_error else "No fallback ducks found",
+                    "success": False
+                })
+        
+        except Exception as e:
+            print(f"❌ Error in waddle_stream_duck: {e}")
+            record_status = 500
+            footprints.error = str(e)
+            yield quack_line({
+                "event": "error",
+                "error": "Quack! Something went wrong while hatching your duck. Please try again.",
+                "message": str(e),
+                "success": False
+            })
+        
+        finally:
+            record_duck_footprints(footprints, record_status)
+    
+    return Response(
+        stream_with_context(quack_stream()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def quack_line(event):
+    """Encode one streaming event as an NDJSON line"""
+    return json.dumps(event) + "\n"
+
+
+def inspect_duck_description(data):
+    """
+    Inspect a generate request body for a usable duck description
+    
+    Args:
+        data: Parsed JSON request body (may be None)
+        
+    Returns:
+        (description, None) if valid, or (description, error response) if not;
+        description is None when the field is missing or not a string
+    """
+    if not isinstance(data, dict) or 'description' not in data:
+        return None, (jsonify({
+            "error": "Quack! Please provide a duck description.",
+            "message": "Missing 'description' field in request",
+            "success": False
+        }), 400)
+    
+    if not isinstance(data['description'], str):
+        return None, (jsonify({
+            "error": "Quack! Please describe your duck in words.",
+            "message": "'description' must be a string",
+            "success": False
+        }), 400)
+    
+    description = data['description'].strip()
+    
+    # Validate description length
+    if not description:
+        return description, (jsonify({
+            "error": "Quack! Please describe your duck before we start hatching.",
+            "message": "Empty description provided",
+            "success": False
+        }), 400)
+    
+    if len(description) > 1024:
+        return description, (jsonify({
+            "error": "Quack! That's too much duck description. Keep it under 1024 characters!",
+            "message": "Description exceeds maximum length of 1024 characters",
+            "success": False
+        }), 400)
+    
+    return description, None
+
+
+def hatch_duck_before_deadline(description, enhanced_description, footprints):
+    """
+    Hatch a duck on a worker thread, giving up at the server-side deadline
+    
+    Args:
+        description: Original user description
+        enhanced_description: Prompt that includes "duck"
+        footprints: DuckFootprints for this request
+        
+    Returns:
+        (image_data, generation_error): image data URL or None, and the
+        error message if generation failed or hit its deadline
+        
+    Raises:
+        DuckCancelled: If the client disconnected while waiting
+    """
+    try:
+        print(f"🦆 Original description: {description}")
+        print(f"🦆 Enhanced description: {enhanced_description}")
+        watch = HatchWatch(HATCH_DEADLINE, STAGE_TIMEOUTS)
+        image_data = await_hatching(
+            lambda: hatch_duck_with_backend(enhanced_description, footprints, watch),
+            watch,
+            flew_away=duck_flew_away,
+        )
+        return image_data, None
+    
+    except DuckCancelled as cancelled:
+        pond_metrics.increment('hatch_cancelled')
+        pond_metrics.increment(f'hatch_cancelled_{cancelled.reason}')
+        if cancelled.stage:
+            pond_metrics.increment(f'hatch_cancelled_during_{cancelled.stage}')
+        footprints.cancelled = cancelled.reason
+        print(f"🛑 {cancelled}")
+        
+        if cancelled.reason == 'client_disconnected':
+            raise
+        
+        footprints.error = str(cancelled)
+        return None, str(cancelled)
+    
+    except Exception as gen_error:
+        footprints.error = str(gen_error)
+        print(f"⚠️ Generation failed: {gen_error}")
+        print("🔄 Attempting to use fallback duck...")
+        return None, str(gen_error)
+
+
+def note_fallback_reason(footprints, generation_error):
+    """Record why a fallback duck is being served"""
+    if footprints.cancelled:
+        footprints.fallback_reason = footprints.cancelled
+    else:
+        footprints.fallback_reason = "generation_error" if generation_error else "no_image"
+
+
+def summon_duck_backend(name):
+    """
+    Create the generation backend selected by DUCK_BACKEND
+    
+    Args:
+        name: "mcp" (agent + Nova Canvas MCP server), "bedrock" (in-process Nova Canvas)
+            or "stub" (local Bedrock stub, no AWS)
+        
+    Returns:
+        DuckBackend instance
+    """
+    if name == 'mcp':
+        return McpAgentDuckBackend(summon_nova_canvas_client, bedrock_model, SYSTEM_PROMPT)
+    if name == 'bedrock':
+        return BedrockCanvasDuckBackend(persist_primary=PERSIST_DUCKS)
+    if name == 'stub':
+        return StubCanvasDuckBackend(latency_s=STUB_LATENCY, persist_primary=PERSIST_DUCKS)
+    raise ValueError(f"Unknown DUCK_BACKEND: {name!r} (use 'mcp', 'bedrock' or 'stub')")
+
+
+def hatch_duck_with_backend(enhanced_description, footprints, watch):
+    """
+    Hatch a duck with the configured generation backend
+    
+    Runs on a worker thread under await_hatching. Counts the generation
+    as in flight and decides how many surplus images to request.
+    
+    Args:
+        enhanced_description: Prompt that includes "duck"
+        footprints: DuckFootprints for per-stage timing
+        watch: HatchWatch shared with the waiting request
+        
+    Returns:
+        Base64-encoded image data URL, or empty string if no duck was hatched
+    """
+    with waddling_duck() as in_flight:
+        pond_metrics.increment('hatch_started')
+        clutch_size = plan_clutch_size(in_flight)
+        footprints.clutch_size = clutch_size
+        
+        image_data = duck_backend.hatch(enhanced_description, clutch_size, footprints, watch)
+        print(f"✅ Image data extracted: {len(image_data) if image_data else 0} chars")
+        if watch.settle():
+            pond_metrics.increment('hatch_completed')
+        else:
+            # The request already counted this duck as cancelled
+            pond_metrics.increment('hatch_finished_after_cancel')
+        return image_data
+
+
+def duck_flew_away():
+    """
+    Check whether the client waiting for this duck has disconnected
+    
+    Peeks at the request socket (available under the Werkzeug server):
+    a readable socket with no pending data means the client closed it.
+    Servers that don't expose the socket are treated as still connected.
+    
+    Returns:
+        True if the client has gone away
+    """
+    sock = request.environ.get('werkzeug.socket')
+    if sock is None:
+        return False
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        if not readable:
+            return False
+        return sock.recv(1, socket.MSG_PEEK) == b''
+    except (OSError, ValueError):
+        return True
+
+
 def quack_enhance_prompt(description):
     """
     Quack-enhance user description to ensure it includes "duck"
@@ -235,6 +586,43 @@ def quack_enhance_prompt(description):
         return f"a duck {description}"
 
 
+@contextmanager
+def waddling_duck():
+    """
+    Count a duck generation as in flight for the duration of the block
+    
+    Yields:
+        Number of generations in flight, including this one
+    """
+    global _waddling_ducks
+    with _waddling_lock:
+        _waddling_ducks += 1
+        in_flight = _waddling_ducks
+    try:
+        yield in_flight
+    finally:
+        with _waddling_lock:
+            _waddling_ducks -= 1
+
+
+def plan_clutch_size(in_flight):
+    """
+    Decide how many images to request from Nova Canvas for one call
+    
+    Surplus images are skipped under load so they never slow down
+    the pond when it is busy.
+    
+    Args:
+        in_flight: Number of generations currently in flight
+        
+    Returns:
+        Number of images to request (1 when the pond is busy)
+    """
+    if in_flight > SURPLUS_MAX_IN_FLIGHT:
+        return 1
+    return IMAGES_PER_CALL
+
+
 def pluck_duck_from_pond(response):
     """
     Pluck the freshly hatched duck image from the pond
@@ -327,6 +715,44 @@ def fetch_backup_duckling():
         return None
 
 
+def fetch_nearest_duckling(prompt):
+    """
+    Fetch the pond duck whose prompt best matches, for an instant preview
+    
+    Uses the in-memory index of the pond ledger; an exact match is
+    effectively a cached result for a repeated description. Falls back to
+    a random backup duckling when nothing in the ledger matches.
+    
+    Args:
+        prompt: Enhanced prompt being generated
+        
+    Returns:
+        (image data URL or None, prompt of the matched duck or None)
+    """
+    output_dir = os.path.join(BACKEND_DIR, 'output')
+    nearest = duck_ledger_index.find_nearest(prompt)
+    if nearest is None:
+        return fetch_backup_duckling(), None
+    
+    path = os.path.join(output_dir, nearest['file'])
+    try:
+        return read_preview_duckling(path, os.path.getmtime(path)), nearest['prompt']
+    except OSError as e:
+        print(f"❌ Error reading preview duck: {e}")
+        return fetch_backup_duckling(), None
+
+
+@lru_cache(maxsize=32)
+def read_preview_duckling(path, mtime):
+    """Read and base64-encode a pond duck, cached by path and modification time"""
+    with open(path, 'rb') as f:
+        image_data = base64.b64encode(f.read()).decode('utf-8')
+    return f"data:image/png;base64,{image_data}"
+
+
+duck_backend = summon_duck_backend(DUCK_BACKEND)
+
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8081))
     
@@ -338,10 +764,11 @@ if __name__ == '__main__':
     print("🦆 Duck Generator Agent")
     print("="*50)
     print(f"✅ Starting on port {port}...")
-    print(f"✅ Nova Canvas MCP configured")
+    print(f"✅ Generation backend: {duck_backend.name}")
     print(f"🦆 Fallback ducks available: {fallback_count}")
     print(f"✅ Ready to generate ducks!")
     print(f"\n🔗 Health check: http://localhost:{port}/health")
     print(f"🔗 Generate endpoint: http://localhost:{port}/api/duck/generate")
+    print(f"🔗 Streaming endpoint: http://localhost:{port}/api/duck/generate/stream")
     print("\n" + "="*50 + "\n")
     app.run(host='0.0.0.0', port=port, debug=True)
@@ -0,0 +1,358 @@
+"""
+Duck Backends - Pluggable image generation backends for the duck generator
+
+Every backend hatches a duck through the same interface (DuckBackend.hatch),
+so the generate endpoint and benchmark_duck_backends.py can swap them freely:
+
+- "mcp" (McpAgentDuckBackend): Nova Pro agent calling the Nova Canvas MCP
+  server over stdio, images round-trip through backend/output
+- "bedrock" (BedrockCanvasDuckBackend): invokes Nova Canvas directly through a
+  shared, connection-pooled boto3 client and keeps images in memory; writing
+  them to the pond is optional and happens on a background thread
+
+StubBedrockRuntime stands in for the Bedrock client when benchmarking offline,
+and StubCanvasDuckBackend ("stub") serves it from the real server so captured
+traffic can be replayed without AWS.
+"""
+
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+import base64
+import glob
+import io
+import json
+import os
+import random
+import re
+import string
+import time
+
+from duck_bedrock import summon_bedrock_runtime, summon_duck_agent
+from duck_ledger import tag_duck_in_ledger
+from duck_metrics import pond_metrics
+
+# Nova Canvas MCP writes to <workspace_dir>/output
+WORKSPACE_DIR = os.path.abspath(os.path.dirname(__file__))
+OUTPUT_DIR = os.path.join(WORKSPACE_DIR, 'output')
+
+# Stub ducks are written here, away from the real fallback pond
+STUB_OUTPUT_DIR = os.path.join(WORKSPACE_DIR, 'stub_output')
+
+NOVA_CANVAS_MODEL_ID = "amazon.nova-canvas-v1:0"
+
+# Nova Canvas accepts prompts up to 1024 characters
+NOVA_CANVAS_MAX_PROMPT = 1024
+
+# PNG paths in generate_image tool results, with or without a file:// prefix
+DUCK_PATH_PATTERN = re.compile(r"(?:file://)?(/[^\s,\"'\[\]]+?\.png)")
+
+# Single background writer so persisting ducks never blocks a response
+_pond_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='duck-pond-writer')
+
+
+class DuckBackend(ABC):
+    """
+    Base class for duck image generation backends
+
+    Subclasses implement hatch(). Backends announce their stages to the
+    HatchWatch so deadlines apply, and record timings on the footprints.
+    """
+
+    name = None
+
+    @abstractmethod
+    def hatch(self, prompt, clutch_size, footprints, watch):
+        """
+        Hatch a duck for the given prompt
+
+        Args:
+            prompt: Enhanced prompt (always includes "duck")
+            clutch_size: Number of images to request; extras are kept as fallback ducks
+            footprints: DuckFootprints for per-stage timing
+            watch: HatchWatch shared with the waiting request
+
+        Returns:
+            Base64-encoded image data URL of the primary duck, or empty string if none hatched
+        """
+
+
+def name_fresh_clutch():
+    """Name a clutch the way the Nova Canvas MCP server does (nova_canvas_<random>)"""
+    suffix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=8))
+    return f"nova_canvas_{suffix}"
+
+
+def stash_clutch(images, prompt, output_dir=OUTPUT_DIR, first_surplus=1):
+    """
+    Write a clutch of base64 PNGs to the pond and tag them in the ledger
+
+    Files are written to a temporary name and renamed, so the fallback
+    picker never reads a half-written duck.
+
+    Args:
+        images: Base64-encoded PNGs, primary first
+        prompt: Prompt that hatched them
+        output_dir: Pond directory
+        first_surplus: Index of the first surplus image in the clutch
+
+    Returns:
+        List of written file paths
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    clutch_name = name_fresh_clutch()
+    ledger_path = os.path.join(output_dir, 'duck_ledger.jsonl')
+    paths = []
+    for position, image in enumerate(images):
+        path = os.path.join(output_dir, f"{clutch_name}_{position + 1}.png")
+        with open(path + '.tmp', 'wb') as f:
+            f.write(base64.b64decode(image))
+        os.replace(path + '.tmp', path)
+        tag_duck_in_ledger(path, prompt, surplus=position >= first_surplus, ledger_path=ledger_path)
+        paths.append(path)
+    return paths
+
+
+def stash_clutch_async(images, prompt, output_dir=OUTPUT_DIR, first_surplus=1):
+    """
+    Queue stash_clutch on the background pond writer
+
+    Nobody waits on the write, so failures are logged and counted as
+    pond_write_errors instead of vanishing with the Future.
+
+    Returns:
+        Future for the queued write
+    """
+    stashing = _pond_writer.submit(stash_clutch, images, prompt, output_dir, first_surplus)
+    stashing.add_done_callback(report_failed_stash)
+    return stashing
+
+
+def report_failed_stash(stashing):
+    """Log and count a background pond write that failed"""
+    error = stashing.exception()
+    if error is not None:
+        pond_metrics.increment('pond_write_errors')
+        print(f"⚠️ Failed to stash ducks in the pond: {error}")
+
+
+def settle_pond_writer():
+    """Block until every queued pond write has finished"""
+    _pond_writer.submit(lambda: None).result()
+
+
+def find_hatched_clutch(messages):
+    """
+    Find the images hatched by an agent's generate_image calls
+
+    Reads the file paths the Nova Canvas MCP server reports in its
+    generate_image tool results, so generations running at the same time
+    in the shared output pond never pick up each other's ducks.
+
+    Args:
+        messages: The agent's conversation messages
+
+    Returns:
+        List of existing PNG paths, primary duck first; empty if nothing was hatched
+    """
+    canvas_calls = set()
+    clutch = []
+    for message in messages:
+        for block in message.get('content', []):
+            tool_use = block.get('toolUse')
+            if tool_use and tool_use.get('name') == 'generate_image':
+                canvas_calls.add(tool_use.get('toolUseId'))
+
+            tool_result = block.get('toolResult')
+            if not tool_result or tool_result.get('toolUseId') not in canvas_calls:
+                continue
+            for item in tool_result.get('content', []):
+                text = item['text'] if 'text' in item else json.dumps(item.get('json', ''))
+                for path in DUCK_PATH_PATTERN.findall(text):
+                    if path not in clutch and os.path.exists(path):
+                        clutch.append(path)
+    return clutch
+
+
+def read_duckling(path):
+    """Read a pond duck as a base64 PNG data URL"""
+    with open(path, 'rb') as f:
+        image_data = base64.b64encode(f.read()).decode('utf-8')
+    return f"data:image/png;base64,{image_data}"
+
+
+class McpAgentDuckBackend(DuckBackend):
+    """
+    Nova Pro agent + Nova Canvas MCP backend
+
+    The agent enriches the prompt and calls the MCP server's generate_image
+    tool, which saves the clutch to <workspace_dir>/output; the primary duck
+    is then read back from the path the tool reported.
+    """
+
+    name = "mcp"
+
+    def __init__(self, mcp_client_factory, model, system_prompt, workspace_dir=WORKSPACE_DIR):
+        self.mcp_client_factory = mcp_client_factory
+        self.model = model
+        self.system_prompt = system_prompt
+        self.workspace_dir = workspace_dir
+
+    def summon_agent(self, mcp_client, tools):
+        """Create the agent that drives the Nova Canvas tools"""
+        return summon_duck_agent(
+            tools=tools,
+            model=self.model,
+            system_prompt=self.system_prompt
+        )
+
+    def hatch(self, prompt, clutch_size, footprints, watch):
+        output_dir = os.path.join(self.workspace_dir, 'output')
+
+        with ExitStack() as pond_stack:
+            watch.enter_stage('mcp_startup')
+            with footprints.waddle_stage('mcp_startup'):
+                mcp_client = pond_stack.enter_context(self.mcp_client_factory())
+                all_tools = mcp_client.list_tools_sync()
+            agent = self.summon_agent(mcp_client, all_tools)
+            # Cancelling the agent stops the Bedrock stream and MCP tool call at the
+            # next safe point; leaving this block then tears down the MCP session.
+            watch.on_abandon(agent.cancel)
+
+            # Ask agent to create the duck
+            agent_prompt = f"Create an image: {prompt}"
+            if clutch_size > 1:
+                agent_prompt += f"\nSet number_of_images to {clutch_size} in a single generate_image call."
+
+            watch.enter_stage('agent')
+            with footprints.waddle_stage('agent'):
+                agent(agent_prompt)
+            print(f"✅ Agent response received")
+
+            # Extract image from the tool results
+            watch.enter_stage('extract')
+            with footprints.waddle_stage('extract'):
+                clutch = find_hatched_clutch(agent.messages)
+                if not clutch:
+                    print("❌ No hatched duck reported by generate_image")
+                    return ""
+                image_data = read_duckling(clutch[0])
+                ledger_path = os.path.join(output_dir, 'duck_ledger.jsonl')
+                for position, duck_path in enumerate(clutch):
+                    tag_duck_in_ledger(duck_path, prompt, surplus=position > 0, ledger_path=ledger_path)
+            if len(clutch) > 1:
+                print(f"🥚 {len(clutch) - 1} surplus ducks added to the fallback pond")
+            return image_data
+
+
+class BedrockCanvasDuckBackend(DuckBackend):
+    """
+    In-process Nova Canvas backend
+
+    Calls InvokeModel on the shared bedrock-runtime client and returns the
+    primary image straight from the response, with no subprocess or
+    filesystem round-trip. Surplus images (and, with persist_primary, the
+    primary duck too) are written to the pond asynchronously.
+
+    An in-flight InvokeModel call cannot be interrupted; it is bounded by
+    the client's read timeout instead.
+    """
+
+    name = "bedrock"
+
+    def __init__(self, client=None, model_id=NOVA_CANVAS_MODEL_ID, output_dir=OUTPUT_DIR,
+                 persist_primary=True, width=1024, height=1024):
+        self.client = client
+        self.model_id = model_id
+        self.output_dir = output_dir
+        self.persist_primary = persist_primary
+        self.width = width
+        self.height = height
+
+    def hatch(self, prompt, clutch_size, footprints, watch):
+        client = self.client or summon_bedrock_runtime()
+        body = json.dumps({
+            "taskType": "TEXT_IMAGE",
+            "textToImageParams": {"text": prompt[:NOVA_CANVAS_MAX_PROMPT]},
+            "imageGenerationConfig": {
+                "numberOfImages": clutch_size,
+                "width": self.width,
+                "height": self.height,
+                "quality": "standard",
+                "cfgScale": 6.5,
+                "seed": random.randint(0, 858993459),
+            },
+        })
+
+        watch.enter_stage('canvas')
+        with footprints.waddle_stage('canvas'):
+            response = client.invoke_model(
+                modelId=self.model_id,
+                body=body,
+                accept='application/json',
+                contentType='application/json',
+            )
+            payload = json.loads(response['body'].read())
+
+        if payload.get('error'):
+            raise RuntimeError(f"Nova Canvas error: {payload['error']}")
+        images = payload.get('images') or []
+        if not images:
+            return ""
+
+        if watch.cancelled.is_set():
+            # Finished after the request gave up: nobody saw these ducks, so
+            # they all join the fallback pond as surplus
+            stash_clutch_async(images, prompt, self.output_dir, first_surplus=0)
+        elif self.persist_primary:
+            stash_clutch_async(images, prompt, self.output_dir, first_surplus=1)
+        elif len(images) > 1:
+            stash_clutch_async(images[1:], prompt, self.output_dir, first_surplus=0)
+
+        return f"data:image/png;base64,{images[0]}"
+
+
+class StubBedrockRuntime:
+    """
+    Local stand-in for the bedrock-runtime client
+
+    Answers InvokeModel for Nova Canvas after a fixed latency with a canned
+    duck, so backends can be benchmarked without AWS.
+    """
+
+    def __init__(self, latency_s=0.0, image_bytes=None):
+        self.latency_s = latency_s
+        self.image = base64.b64encode(image_bytes or find_stub_duckling()).decode('utf-8')
+
+    def invoke_model(self, modelId, body, **kwargs):
+        request = json.loads(body)
+        count = request.get('imageGenerationConfig', {}).get('numberOfImages', 1)
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        return {"body": io.BytesIO(json.dumps({"images": [self.image] * count}).encode('utf-8'))}
+
+
+class StubCanvasDuckBackend(BedrockCanvasDuckBackend):
+    """
+    In-process backend on the local Bedrock stub
+
+    Hatches canned ducks after a fixed latency, exercising the same request,
+    deadline and pond-writer path as the bedrock backend, so load can be
+    replayed against the server offline. Ducks go to stub_output/, not the
+    fallback pond.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency_s=0.0, output_dir=STUB_OUTPUT_DIR, persist_primary=True):
+        super().__init__(client=StubBedrockRuntime(latency_s=latency_s), output_dir=output_dir,
+                         persist_primary=persist_primary)
+
+
+def find_stub_duckling():
+    """Bytes of a real pond duck to use as the canned stub image"""
+    ducks = sorted(glob.glob(os.path.join(OUTPUT_DIR, '*.png')))
+    if not ducks:
+        raise FileNotFoundError(f"No ducks in {OUTPUT_DIR} to use as a stub image")
+    with open(ducks[0], 'rb') as f:
+        return f.read()
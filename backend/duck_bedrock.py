@@ -0,0 +1,261 @@
+"""
+Duck Bedrock Client - Shared, connection-pooled Bedrock client for every duck
+
+One bedrock-runtime client is shared by the Nova Pro agent model, the
+in-process Nova Canvas backend and the batch generator, so they share a
+single connection pool instead of each paying for its own TLS handshakes.
+
+The client uses keep-alive, adaptive retries with a small attempt budget
+(our fallback ducks are the real safety net) and connect/read timeouts that
+fit inside the request deadline. Strands agents built with summon_duck_agent
+add no retry loop of their own on top unless DUCK_AGENT_MAX_ATTEMPTS asks for
+one. Pool saturation, retries and errors are counted in pond_metrics.
+
+Settings (environment variables):
+    DUCK_BEDROCK_REGION           region (default: session region, else us-east-1)
+    DUCK_BEDROCK_POOL_SIZE        max pooled connections (default 16)
+    DUCK_BEDROCK_CONNECT_TIMEOUT  seconds (default 2)
+    DUCK_BEDROCK_READ_TIMEOUT     seconds (default 20, under DUCK_HATCH_DEADLINE)
+    DUCK_BEDROCK_MAX_ATTEMPTS     total attempts including the first (default 2)
+    DUCK_AGENT_MAX_ATTEMPTS       Strands agent-level model attempts (default 1, no extra retries)
+"""
+
+import os
+import threading
+
+import boto3
+from botocore.config import Config
+from botocore.eventstream import EventStream
+from strands import Agent, ModelRetryStrategy
+from strands.hooks import AfterModelCallEvent, BeforeInvocationEvent, BeforeModelCallEvent, HookProvider
+
+from duck_metrics import pond_metrics
+
+BEDROCK_POOL_SIZE = int(os.environ.get('DUCK_BEDROCK_POOL_SIZE', 16))
+BEDROCK_CONNECT_TIMEOUT = float(os.environ.get('DUCK_BEDROCK_CONNECT_TIMEOUT', 2))
+BEDROCK_READ_TIMEOUT = float(os.environ.get('DUCK_BEDROCK_READ_TIMEOUT', 20))
+BEDROCK_MAX_ATTEMPTS = int(os.environ.get('DUCK_BEDROCK_MAX_ATTEMPTS', 2))
+AGENT_MAX_ATTEMPTS = int(os.environ.get('DUCK_AGENT_MAX_ATTEMPTS', 1))
+
+_bedrock_runtime = None
+_bedrock_runtime_lock = threading.Lock()
+
+
+def summon_bedrock_config():
+    """Botocore config shared by every duck Bedrock client"""
+    return Config(
+        max_pool_connections=BEDROCK_POOL_SIZE,
+        tcp_keepalive=True,
+        connect_timeout=BEDROCK_CONNECT_TIMEOUT,
+        read_timeout=BEDROCK_READ_TIMEOUT,
+        retries={'mode': 'adaptive', 'total_max_attempts': BEDROCK_MAX_ATTEMPTS},
+        # BedrockModel tags its own client this way; keep the tag on the shared one
+        user_agent_extra='strands-agents',
+    )
+
+
+def resolve_bedrock_region():
+    """Region for duck Bedrock calls (Nova Canvas lives in us-east-1)"""
+    return (
+        os.environ.get('DUCK_BEDROCK_REGION')
+        or boto3.Session().region_name
+        or 'us-east-1'
+    )
+
+
+def summon_bedrock_runtime():
+    """
+    Get the process-wide bedrock-runtime client
+
+    boto3 clients are thread-safe, so one client (and its connection
+    pool) is shared by every request.
+    """
+    global _bedrock_runtime
+    with _bedrock_runtime_lock:
+        if _bedrock_runtime is None:
+            client = boto3.client(
+                'bedrock-runtime',
+                region_name=resolve_bedrock_region(),
+                config=summon_bedrock_config(),
+            )
+            watch_bedrock_pond(client)
+            _bedrock_runtime = client
+        return _bedrock_runtime
+
+
+def summon_bedrock_model(**model_config):
+    """
+    Create a Strands BedrockModel that uses the shared bedrock-runtime client
+
+    BedrockModel always builds a client of its own; it is replaced by the
+    shared client, so the one it built is discarded (a one-off startup
+    cost). The shared client carries the same "strands-agents" user agent
+    and signs with SigV4, so BedrockModel's api_key option is not supported.
+
+    Args:
+        **model_config: BedrockModel settings such as model_id and temperature
+    """
+    from strands.models import BedrockModel
+
+    if 'api_key' in model_config:
+        raise ValueError("api_key is not supported with the shared Bedrock client")
+
+    model = BedrockModel(
+        boto_client_config=summon_bedrock_config(),
+        region_name=resolve_bedrock_region(),
+        **model_config
+    )
+    model.client = summon_bedrock_runtime()
+    return model
+
+
+class AgentRetryCounter(HookProvider):
+    """
+    Count Strands agent-level model retries as agent_retries
+
+    A model call that starts right after a failed one within the same
+    invocation is a retry.
+    """
+
+    def __init__(self):
+        self._last_call_failed = False
+
+    def register_hooks(self, registry, **kwargs):
+        registry.add_callback(BeforeInvocationEvent, self.start_invocation)
+        registry.add_callback(BeforeModelCallEvent, self.count_retry)
+        registry.add_callback(AfterModelCallEvent, self.note_outcome)
+
+    def start_invocation(self, event):
+        self._last_call_failed = False
+
+    def count_retry(self, event):
+        if self._last_call_failed:
+            pond_metrics.increment('agent_retries')
+        self._last_call_failed = False
+
+    def note_outcome(self, event):
+        self._last_call_failed = event.exception is not None
+
+
+def summon_duck_agent(max_attempts=None, retry_delay=1, **agent_config):
+    """
+    Create a Strands Agent on the duck retry budget
+
+    Strands' default retry strategy (6 attempts, sleeping 4-32 s) would
+    stack on the client's own retries and sleep far past the request
+    deadline, so request-path agents default to DUCK_AGENT_MAX_ATTEMPTS
+    (1, no agent-level retries). Callers without a deadline can pass a
+    larger budget. Any agent-level retries are counted.
+
+    Args:
+        max_attempts: Total model attempts per call, including the first
+            (default DUCK_AGENT_MAX_ATTEMPTS)
+        retry_delay: Seconds before the first retry (doubles, capped at 4x)
+        **agent_config: Agent settings such as tools, model and system_prompt
+    """
+    retry_strategy = ModelRetryStrategy(
+        max_attempts=max_attempts or AGENT_MAX_ATTEMPTS, initial_delay=retry_delay, max_delay=retry_delay * 4
+    )
+    hooks = list(agent_config.pop('hooks', None) or []) + [AgentRetryCounter()]
+    return Agent(retry_strategy=retry_strategy, hooks=hooks, **agent_config)
+
+
+class PondStream:
+    """Event stream that frees its in-flight slot once read to the end or closed"""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+        self._released = False
+
+    def __iter__(self):
+        try:
+            yield from self._stream
+        finally:
+            self._free()
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._free()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def __del__(self):
+        self._free()
+
+    def _free(self):
+        if not self._released:
+            self._released = True
+            self._release()
+
+
+def watch_bedrock_pond(client):
+    """
+    Count Bedrock calls, attempts, retries, errors and connection pool saturation
+
+    Every HTTP attempt is counted while in flight; attempts beyond the pool
+    size can't reuse a pooled connection and open a new one instead.
+    Streaming responses (converse_stream) hold their connection until the
+    stream is read to the end or closed, so they stay in flight until then.
+    """
+    in_flight = {"count": 0}
+    in_flight_lock = threading.Lock()
+
+    def release():
+        with in_flight_lock:
+            in_flight["count"] -= 1
+
+    def on_call(model=None, context=None, **kwargs):
+        pond_metrics.increment('bedrock_calls')
+        if model is not None and context is not None:
+            context['duck_event_stream'] = model.has_event_stream_output
+
+    def on_send(**kwargs):
+        with in_flight_lock:
+            in_flight["count"] += 1
+            current = in_flight["count"]
+        pond_metrics.increment('bedrock_attempts')
+        if current > BEDROCK_POOL_SIZE:
+            pond_metrics.increment('bedrock_pool_saturated')
+
+    def on_response(response_dict=None, context=None, **kwargs):
+        streaming = (
+            (context or {}).get('duck_event_stream')
+            and response_dict is not None
+            and response_dict['status_code'] < 300
+        )
+        # A successful stream is released by its PondStream in on_success
+        if not streaming:
+            release()
+
+    def on_success(http_response=None, parsed=None, model=None, **kwargs):
+        parsed = parsed or {}
+        failed = http_response is not None and http_response.status_code >= 300
+        if failed:
+            # HTTP errors (throttling, 5xx after the last retry) arrive here, not in after-call-error
+            pond_metrics.increment('bedrock_errors')
+        elif model is not None and model.has_event_stream_output:
+            for key, value in parsed.items():
+                if isinstance(value, EventStream):
+                    parsed[key] = PondStream(value, release)
+        retries = parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+        if retries:
+            pond_metrics.increment('bedrock_retries', retries)
+
+    def on_error(exception=None, **kwargs):
+        pond_metrics.increment('bedrock_errors')
+        response = getattr(exception, 'response', None) or {}
+        retries = response.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+        if retries:
+            pond_metrics.increment('bedrock_retries', retries)
+
+    events = client.meta.events
+    events.register('before-call.bedrock-runtime', on_call)
+    events.register('before-send.bedrock-runtime', on_send)
+    events.register('response-received.bedrock-runtime', on_response)
+    events.register('after-call.bedrock-runtime', on_success)
+    events.register('after-call-error.bedrock-runtime', on_error)
+    return client
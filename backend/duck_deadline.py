@@ -0,0 +1,160 @@
+"""
+Duck Deadlines - Server-side timeouts and cancellation for duck generation
+
+The frontend gives up on a duck after 30 seconds. These helpers make the
+backend give up too: generation runs on a worker thread while the request
+thread watches an overall deadline, per-stage timeouts and the client
+connection, and cooperatively cancels the work when any of them trips.
+"""
+
+import threading
+import time
+
+
+class DuckCancelled(Exception):
+    """Raised when a duck generation is abandoned before it finishes"""
+
+    def __init__(self, reason, stage=None):
+        self.reason = reason
+        self.stage = stage
+        super().__init__(f"Duck generation cancelled ({reason}{f' during {stage}' if stage else ''})")
+
+
+class HatchWatch:
+    """
+    Deadline and cancellation state shared by a request and its generation worker
+
+    The worker announces each stage with enter_stage() and registers
+    abandon hooks (e.g. agent.cancel) for work that can be interrupted.
+    The request thread calls check() to see if the deadline, a stage
+    timeout or the client has given up, and abandon() to cancel.
+    """
+
+    def __init__(self, deadline_s, stage_timeouts=None):
+        self.deadline = time.monotonic() + deadline_s
+        self.stage_timeouts = stage_timeouts or {}
+        self.stage = None
+        self.stage_started = None
+        self.reason = None
+        self.cancelled = threading.Event()
+        self.settled = False
+        self._lock = threading.Lock()
+        self._abandon_hooks = []
+
+    def remaining(self):
+        """Seconds left before the overall deadline"""
+        return max(0.0, self.deadline - time.monotonic())
+
+    def enter_stage(self, name):
+        """Mark the start of a stage; raises DuckCancelled if already abandoned"""
+        if self.cancelled.is_set():
+            raise DuckCancelled(self.reason, self.stage)
+        with self._lock:
+            self.stage = name
+            self.stage_started = time.monotonic()
+
+    def on_abandon(self, hook):
+        """Register a callable to run when the generation is abandoned"""
+        with self._lock:
+            self._abandon_hooks.append(hook)
+        if self.cancelled.is_set():
+            hook()
+
+    def check(self):
+        """
+        Check whether the generation should be abandoned
+
+        Returns:
+            'deadline', 'stage_timeout' or None
+        """
+        now = time.monotonic()
+        if now >= self.deadline:
+            return 'deadline'
+        with self._lock:
+            stage, stage_started = self.stage, self.stage_started
+        stage_timeout = self.stage_timeouts.get(stage)
+        if stage_timeout is not None and now - stage_started >= stage_timeout:
+            return 'stage_timeout'
+        return None
+
+    def settle(self):
+        """
+        Mark the generation as finished, unless it was already abandoned
+
+        Settling and abandoning exclude each other, so a generation is
+        counted as either completed or cancelled, never both.
+
+        Returns:
+            True if the generation finished in time, False if it was abandoned
+        """
+        with self._lock:
+            if self.cancelled.is_set():
+                return False
+            self.settled = True
+            return True
+
+    def abandon(self, reason):
+        """
+        Cancel the generation and run every abandon hook once
+
+        Returns:
+            True if this call cancelled it, False if it was already
+            cancelled or had already settled
+        """
+        with self._lock:
+            if self.cancelled.is_set() or self.settled:
+                return False
+            self.reason = reason
+            self.cancelled.set()
+            hooks = list(self._abandon_hooks)
+        for hook in hooks:
+            try:
+                hook()
+            except Exception as e:
+                print(f"⚠️ Abandon hook failed: {e}")
+        return True
+
+
+def await_hatching(work, watch, flew_away=None, poll_interval=0.25):
+    """
+    Run work() on a worker thread until it finishes or is abandoned
+
+    Args:
+        work: Callable performing the generation
+        watch: HatchWatch shared with the worker
+        flew_away: Optional callable returning True once the client disconnected
+        poll_interval: Seconds between deadline/disconnect checks
+
+    Returns:
+        The value returned by work()
+
+    Raises:
+        DuckCancelled: If the deadline, a stage timeout or a disconnect tripped
+        Exception: Whatever work() raised
+    """
+    outcome = {}
+    done = threading.Event()
+
+    def hatch():
+        try:
+            outcome['result'] = work()
+        except BaseException as e:
+            outcome['error'] = e
+        finally:
+            done.set()
+
+    threading.Thread(target=hatch, name='duck-hatch', daemon=True).start()
+
+    while not done.wait(min(poll_interval, watch.remaining())):
+        reason = watch.check()
+        if reason is None and flew_away is not None and flew_away():
+            reason = 'client_disconnected'
+        if reason is not None:
+            stage = watch.stage
+            if watch.abandon(reason):
+                raise DuckCancelled(reason, stage)
+            # The work settled just in time; collect its result
+
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
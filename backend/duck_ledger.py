@@ -0,0 +1,165 @@
+"""
+Duck Pond Ledger - Prompt tags for ducks in the output pond
+
+Every generated duck image (including surplus images from multi-image calls)
+is recorded here with the prompt that hatched it. The PNGs themselves stay in
+backend/output, which is also the fallback pool, so surplus images become
+fallback ducks as soon as they are written.
+"""
+
+from datetime import datetime, timezone
+import json
+import os
+import re
+import threading
+
+OUTPUT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), 'output'))
+LEDGER_PATH = os.path.join(OUTPUT_DIR, 'duck_ledger.jsonl')
+
+# Words every duck prompt shares; they say nothing about which duck is nearest
+QUIET_WORDS = {'a', 'an', 'the', 'duck', 'ducks', 'with', 'in', 'on', 'of', 'and', 'at', 'to', 'is'}
+
+_ledger_lock = threading.Lock()
+
+
+def tag_duck_in_ledger(image_path, prompt, surplus=False, ledger_path=LEDGER_PATH):
+    """
+    Tag a duck image with the prompt that hatched it
+
+    Args:
+        image_path: Path (or file name) of the PNG in the output pond
+        prompt: Prompt sent to the image model
+        surplus: True if the image was an extra from a multi-image call
+    """
+    entry = {
+        "file": os.path.basename(image_path),
+        "prompt": prompt,
+        "surplus": surplus,
+        "hatched_at": datetime.now(timezone.utc).isoformat(),
+    }
+    line = json.dumps(entry, ensure_ascii=False)
+    with _ledger_lock:
+        os.makedirs(os.path.dirname(ledger_path), exist_ok=True)
+        with open(ledger_path, 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+    return entry
+
+
+def read_duck_ledger(ledger_path=LEDGER_PATH):
+    """
+    Read all tagged ducks from the ledger
+
+    Returns:
+        Dict mapping image file name to its most recent ledger entry
+    """
+    entries = {}
+    if not os.path.exists(ledger_path):
+        return entries
+    with _ledger_lock:
+        with open(ledger_path, encoding='utf-8') as f:
+            lines = f.readlines()
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        entries[entry['file']] = entry
+    return entries
+
+
+def pluck_prompt_words(prompt):
+    """Lowercased content words of a prompt"""
+    return set(re.findall(r"[a-z0-9']+", prompt.lower())) - QUIET_WORDS
+
+
+def find_nearest_duck(prompt, entries):
+    """
+    Find the tagged duck whose prompt is closest to a new prompt
+
+    Closeness is word overlap (Jaccard similarity of content words), so a
+    repeated description finds its own duck and "a duck in a space suit"
+    finds "a duck astronaut floating in space".
+
+    Args:
+        prompt: Prompt about to be generated
+        entries: Ledger entries, e.g. read_duck_ledger().values(); entries
+            carrying precomputed 'words' (DuckLedgerIndex) skip tokenizing
+
+    Returns:
+        The best matching entry, or None if no entry shares a word
+    """
+    wanted = pluck_prompt_words(prompt)
+    nearest, nearest_score = None, 0.0
+    for entry in entries:
+        words = entry.get('words')
+        if words is None:
+            words = pluck_prompt_words(entry.get('prompt') or '')
+        if not wanted or not words:
+            continue
+        score = len(wanted & words) / len(wanted | words)
+        if score > nearest_score:
+            nearest, nearest_score = entry, score
+    return nearest
+
+
+class DuckLedgerIndex:
+    """
+    In-memory view of the ledger for fast nearest-duck lookups
+
+    The ledger only ever grows, so each refresh reads just the lines
+    appended since the last one. Entries are kept once per distinct prompt
+    (the newest duck wins) with their content words precomputed, and pond
+    files are checked for existence once, when their line is first read.
+    """
+
+    def __init__(self, ledger_path=LEDGER_PATH):
+        self.ledger_path = ledger_path
+        self._offset = 0
+        self._by_prompt = {}
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """
+        Pick up ledger lines written since the last refresh
+
+        Returns:
+            List of indexed entries, one per distinct prompt
+        """
+        with self._lock:
+            try:
+                size = os.path.getsize(self.ledger_path)
+            except OSError:
+                size = 0
+            if size < self._offset:
+                # Ledger was truncated or replaced; start over
+                self._offset = 0
+                self._by_prompt = {}
+            if size > self._offset:
+                with _ledger_lock:
+                    with open(self.ledger_path, 'rb') as f:
+                        f.seek(self._offset)
+                        appended = f.read(size - self._offset)
+                # Leave a partially written last line for the next refresh
+                complete = appended.rfind(b'\n') + 1
+                self._offset += complete
+                self._index_lines(appended[:complete].decode('utf-8').splitlines())
+            return list(self._by_prompt.values())
+
+    def find_nearest(self, prompt):
+        """Find the indexed duck whose prompt is closest (see find_nearest_duck)"""
+        return find_nearest_duck(prompt, self.refresh())
+
+    def _index_lines(self, lines):
+        output_dir = os.path.dirname(self.ledger_path)
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            prompt = entry.get('prompt') or ''
+            if not os.path.exists(os.path.join(output_dir, entry['file'])):
+                continue
+            self._by_prompt[prompt] = dict(entry, words=pluck_prompt_words(prompt))
@@ -0,0 +1,29 @@
+"""
+Duck Pond Metrics - In-process counters for the duck generator
+
+A tiny thread-safe counter registry exposed by the /api/duck/metrics endpoint.
+"""
+
+from collections import Counter
+import threading
+
+
+class PondMetrics:
+    """Thread-safe named counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def increment(self, name, amount=1):
+        """Add amount to the named counter"""
+        with self._lock:
+            self._counts[name] += amount
+
+    def snapshot(self):
+        """Return a copy of all counters"""
+        with self._lock:
+            return dict(self._counts)
+
+
+pond_metrics = PondMetrics()
@@ -0,0 +1,116 @@
+"""
+Duck Traffic Recorder - Opt-in capture of duck generation requests
+
+Appends one JSON line per generate request (plain or streaming) to a
+rotating log so real booth traffic can be replayed later with
+replay_duck_traffic.py.
+
+Capture is off unless DUCK_CAPTURE_LOG points at a log file.
+"""
+
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import json
+import logging
+import logging.handlers
+import os
+import time
+
+
+class DuckFootprints:
+    """
+    Footprints left by a single duck request on its way through the pond
+
+    Tracks the per-stage latencies, outcome and fallback reason of one request.
+    """
+
+    def __init__(self, endpoint=None):
+        self.started_at = time.time()
+        self.endpoint = endpoint
+        self._started = time.perf_counter()
+        self.description = None
+        self.stages_ms = {}
+        self.fallback_reason = None
+        self.error = None
+        self.clutch_size = None
+        self.cancelled = None
+
+    @contextmanager
+    def waddle_stage(self, name):
+        """Time a named stage of the request (accumulates if repeated)"""
+        stage_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - stage_start) * 1000
+            self.stages_ms[name] = round(self.stages_ms.get(name, 0) + elapsed_ms, 2)
+
+    def to_record(self, status_code):
+        """Build the JSON-serialisable capture record for this request"""
+        if self.cancelled == "client_disconnected":
+            outcome = "cancelled"
+        elif status_code >= 500:
+            outcome = "error"
+        elif status_code >= 400:
+            outcome = "rejected"
+        elif self.fallback_reason:
+            outcome = "fallback"
+        else:
+            outcome = "generated"
+
+        return {
+            "timestamp": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(),
+            "epoch": round(self.started_at, 6),
+            "endpoint": self.endpoint,
+            "description": self.description,
+            "status": status_code,
+            "outcome": outcome,
+            "fallback_reason": self.fallback_reason,
+            "error": self.error,
+            "clutch_size": self.clutch_size,
+            "cancelled": self.cancelled,
+            "stages_ms": self.stages_ms,
+            "total_ms": round((time.perf_counter() - self._started) * 1000, 2),
+        }
+
+
+class DuckTrafficRecorder:
+    """
+    Append-only, size-rotated JSONL log of duck requests
+
+    Rotation and write locking are delegated to logging's RotatingFileHandler,
+    so the recorder is safe to share between request threads.
+    """
+
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, backup_count=5):
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._handler = logging.handlers.RotatingFileHandler(
+            self.path,
+            maxBytes=max_bytes,
+            backupCount=backup_count,
+            encoding="utf-8",
+        )
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+
+    @classmethod
+    def from_env(cls):
+        """Create a recorder from DUCK_CAPTURE_* settings, or None if capture is off"""
+        path = os.environ.get("DUCK_CAPTURE_LOG")
+        if not path:
+            return None
+        return cls(
+            path,
+            max_bytes=int(os.environ.get("DUCK_CAPTURE_MAX_BYTES", 10 * 1024 * 1024)),
+            backup_count=int(os.environ.get("DUCK_CAPTURE_BACKUPS", 5)),
+        )
+
+    def record_footprints(self, footprints, status_code):
+        """Append the capture record for one finished request"""
+        record = footprints.to_record(status_code)
+        line = json.dumps(record, ensure_ascii=False)
+        self._handler.handle(logging.makeLogRecord({"msg": line, "levelno": logging.INFO}))
+        return record
+
+    def close(self):
+        self._handler.close()
@@ -7,9 +7,9 @@ if the model is unavailable during the event.
 """
 
 from mcp import StdioServerParameters, stdio_client
-from strands import Agent
-from strands.models import BedrockModel
+from strands.agent.conversation_manager import SlidingWindowConversationManager
 from strands.tools.mcp import MCPClient
+from duck_bedrock import summon_bedrock_model, summon_duck_agent
 import time
 import os
 import glob
@@ -38,6 +38,28 @@ DUCK_DESCRIPTIONS = [
     "a duck wearing a graduation cap with diploma, scholarly duck",
 ]
 
+# Conversation context strategies for the long-lived batch agent:
+#   "reset"  - clear the agent's history before every duck (each call sees only its own prompt)
+#   "window" - keep a bounded sliding window of the most recent messages
+CONTEXT_STRATEGIES = ('reset', 'window')
+
+
+def read_context_strategy():
+    """Read DUCK_CONTEXT_STRATEGY, rejecting unknown values before any work starts"""
+    strategy = os.environ.get('DUCK_CONTEXT_STRATEGY', 'reset')
+    if strategy not in CONTEXT_STRATEGIES:
+        raise ValueError(f"Unknown DUCK_CONTEXT_STRATEGY: {strategy!r} (use 'reset' or 'window')")
+    return strategy
+
+
+CONTEXT_STRATEGY = read_context_strategy()
+CONTEXT_WINDOW_SIZE = int(os.environ.get('DUCK_CONTEXT_WINDOW', 8))
+
+# No request deadline or fallback duck here, so ride out throttling with a
+# bigger agent-level retry budget than the request path
+BATCH_MAX_ATTEMPTS = int(os.environ.get('DUCK_BATCH_MAX_ATTEMPTS', 6))
+BATCH_RETRY_DELAY = 4
+
 # Get the absolute path to the output directory
 output_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), 'output'))
 
@@ -51,8 +73,8 @@ nova_canvas_client = MCPClient(
     )
 )
 
-# Configure Bedrock Model
-bedrock_model = BedrockModel(
+# Configure Bedrock Model (shared pooled client, same settings as the duck agent)
+bedrock_model = summon_bedrock_model(
     model_id="us.amazon.nova-pro-v1:0",
     temperature=0.7,
 )
@@ -69,17 +91,47 @@ IMPORTANT: Save all generated images to this workspace directory: {workspace_dir
 """
 
 
-def generate_duck(agent, description, index):
-    """Generate a single duck image"""
+def create_batch_agent(tools, system_prompt):
+    """Create the batch agent with the configured context strategy"""
+    conversation_manager = None
+    if CONTEXT_STRATEGY == 'window':
+        conversation_manager = SlidingWindowConversationManager(window_size=CONTEXT_WINDOW_SIZE)
+    
+    return summon_duck_agent(
+        max_attempts=BATCH_MAX_ATTEMPTS,
+        retry_delay=BATCH_RETRY_DELAY,
+        tools=tools, 
+        model=bedrock_model, 
+        system_prompt=system_prompt,
+        conversation_manager=conversation_manager
+    )
+
+
+def generate_duck(agent, description, index, call_stats):
+    """Generate a single duck image, appending its token/latency stats to call_stats"""
     try:
         print(f"\n{'='*60}")
         print(f"🦆 Generating duck {index + 1}/{len(DUCK_DESCRIPTIONS)}")
         print(f"📝 Description: {description}")
         print(f"{'='*60}")
         
+        # Drop previous ducks from the conversation so context stays constant per call
+        if CONTEXT_STRATEGY == 'reset':
+            agent.messages.clear()
+        
+        context_messages = len(agent.messages)
+        input_tokens_before = agent.event_loop_metrics.accumulated_usage['inputTokens']
+        call_start = time.perf_counter()
+        
         # Generate the duck
         response = agent(f"Create an image: {description}")
         
+        latency_ms = (time.perf_counter() - call_start) * 1000
+        input_tokens = agent.event_loop_metrics.accumulated_usage['inputTokens'] - input_tokens_before
+        call_stats.append({"input_tokens": input_tokens, "latency_ms": latency_ms})
+        print(f"📊 Input tokens: {input_tokens} | Latency: {latency_ms:.0f} ms | "
+              f"Prior context messages: {context_messages}")
+        
         # Wait a moment for file to be written
         time.sleep(1)
         
@@ -127,19 +179,16 @@ def main():
         # Create system prompt with workspace directory
         system_prompt = SYSTEM_PROMPT_TEMPLATE.format(workspace_dir=os.path.abspath(script_output_dir))
         
-        agent = Agent(
-            tools=all_tools, 
-            model=bedrock_model, 
-            system_prompt=system_prompt
-        )
-        print("✅ Agent initialized!\n")
+        agent = create_batch_agent(all_tools, system_prompt)
+        print(f"✅ Agent initialized! (context strategy: {CONTEXT_STRATEGY})\n")
         
         # Generate each duck
         successful = 0
         failed = 0
+        call_stats = []
         
         for i, description in enumerate(DUCK_DESCRIPTIONS):
-            if generate_duck(agent, description, i):
+            if generate_duck(agent, description, i, call_stats):
                 successful += 1
             else:
                 failed += 1
@@ -157,6 +206,13 @@ def main():
         print(f"❌ Failed: {failed}")
         print(f"📊 Total: {successful + failed}")
         
+        if call_stats:
+            total_input_tokens = sum(stat['input_tokens'] for stat in call_stats)
+            mean_latency_ms = sum(stat['latency_ms'] for stat in call_stats) / len(call_stats)
+            print(f"🔢 Input tokens: {total_input_tokens} total, "
+                  f"{call_stats[0]['input_tokens']} first call, {call_stats[-1]['input_tokens']} last call")
+            print(f"⏱️  Mean agent latency: {mean_latency_ms:.0f} ms")
+        
         # Count final ducks
         final_ducks = len(glob.glob(os.path.join(script_output_dir, '*.png')))
         print(f"📦 Total ducks in output: {final_ducks}")
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Duck Traffic Replayer - Re-drive captured duck requests against a server
+
+Reads JSONL logs written by the traffic recorder (DUCK_CAPTURE_LOG) and
+replays each description against the endpoint it was captured from
+(/api/duck/generate or /api/duck/generate/stream), preserving the
+original inter-arrival times at 1x, Nx or max speed. Prints the latency
+distribution and fallback rate of the replay.
+
+Latency is measured from each request's scheduled time, so time spent
+waiting for a free worker (when --concurrency is saturated) counts against
+the server just as a real user's wait would. That queue delay is also
+reported on its own.
+
+Run the server with DUCK_BACKEND=stub (and DUCK_STUB_LATENCY) to replay
+without AWS.
+
+Usage:
+    python3 replay_duck_traffic.py traffic/duck_traffic.jsonl --speed 10
+    python3 replay_duck_traffic.py traffic/duck_traffic.jsonl* --speed max
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import math
+import threading
+import time
+import urllib.error
+import urllib.request
+
+# Endpoint for records captured before the endpoint was recorded
+DEFAULT_ENDPOINT = '/api/duck/generate'
+
+# Warn when a request starts this far behind its scheduled time
+BEHIND_SCHEDULE_WARNING_MS = 100
+
+
+def gather_duck_tracks(paths):
+    """
+    Gather captured requests from one or more capture logs
+
+    Rotated logs can be passed together; records are ordered by capture time.
+    Requests without a description (malformed bodies) cannot be replayed and
+    are skipped.
+
+    Returns:
+        List of capture records sorted by epoch
+    """
+    tracks = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                if record.get('description') is None:
+                    continue
+                tracks.append(record)
+    tracks.sort(key=lambda record: record['epoch'])
+    return tracks
+
+
+def plan_waddle_schedule(tracks, speed):
+    """
+    Plan when each captured request should be replayed
+
+    Args:
+        tracks: Capture records sorted by epoch
+        speed: Replay speed multiplier, or None for max speed
+
+    Returns:
+        List of (offset_seconds, record) tuples relative to replay start
+    """
+    if not tracks:
+        return []
+    first_epoch = tracks[0]['epoch']
+    schedule = []
+    for record in tracks:
+        offset = 0.0 if speed is None else (record['epoch'] - first_epoch) / speed
+        schedule.append((offset, record))
+    return schedule
+
+
+def quack_percentile(sorted_values, percentile):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(percentile / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize_flock(results):
+    """
+    Summarize replay results into a latency distribution and fallback rate
+
+    Args:
+        results: Dicts with 'latency_ms', 'status' and 'is_fallback',
+            and optionally 'queue_delay_ms'
+
+    Returns:
+        Summary dict
+    """
+    latencies = sorted(r['latency_ms'] for r in results)
+    queue_delays = sorted(r['queue_delay_ms'] for r in results if r.get('queue_delay_ms') is not None)
+    succeeded = [r for r in results if r['status'] == 200 and not r.get('error')]
+    fallbacks = [r for r in succeeded if r['is_fallback']]
+    failed = len(results) - len(succeeded)
+
+    return {
+        "requests": len(results),
+        "succeeded": len(succeeded),
+        "failed": failed,
+        "fallback_rate": round(len(fallbacks) / len(succeeded), 4) if succeeded else None,
+        "latency_ms": {
+            "min": latencies[0] if latencies else None,
+            "p50": quack_percentile(latencies, 50),
+            "p90": quack_percentile(latencies, 90),
+            "p95": quack_percentile(latencies, 95),
+            "p99": quack_percentile(latencies, 99),
+            "max": latencies[-1] if latencies else None,
+        },
+        "queue_delay_ms": {
+            "p50": quack_percentile(queue_delays, 50),
+            "p95": quack_percentile(queue_delays, 95),
+            "max": queue_delays[-1] if queue_delays else None,
+        },
+        "behind_schedule": sum(1 for delay in queue_delays if delay > BEHIND_SCHEDULE_WARNING_MS),
+    }
+
+
+def quack_replay_request(url, description, timeout, scheduled_at=None):
+    """
+    Send one captured description to the generate endpoint
+
+    Args:
+        url: Generate endpoint URL (plain JSON or NDJSON streaming)
+        description: Captured description
+        timeout: Client timeout in seconds
+        scheduled_at: time.perf_counter() value the request was due at;
+            latency is measured from here (defaults to now)
+    """
+    body = json.dumps({"description": description}).encode('utf-8')
+    req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    started = time.perf_counter()
+    scheduled_at = started if scheduled_at is None else scheduled_at
+    status = None
+    is_fallback = False
+    error = None
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            status = resp.status
+            body = resp.read()
+            if 'ndjson' in resp.headers.get('Content-Type', ''):
+                # Streaming endpoint: the last event carries the final duck (or error)
+                payload = json.loads(body.splitlines()[-1])
+                if payload.get('event') == 'error':
+                    error = payload.get('message')
+            else:
+                payload = json.loads(body)
+            is_fallback = bool(payload.get('is_fallback'))
+    except urllib.error.HTTPError as e:
+        status = e.code
+        error = str(e)
+    except Exception as e:
+        error = str(e)
+
+    return {
+        "latency_ms": round((time.perf_counter() - scheduled_at) * 1000, 2),
+        "queue_delay_ms": round(max(0.0, started - scheduled_at) * 1000, 2),
+        "status": status,
+        "is_fallback": is_fallback,
+        "error": error,
+    }
+
+
+def waddle_replay(schedule, base_url, concurrency, timeout):
+    """
+    Replay a schedule against the server, firing each request on time
+
+    A single dispatcher sleeps until each request's offset and hands it to a
+    worker pool, so overlapping requests run concurrently just as they did
+    when captured. Latency counts from the scheduled time, including any
+    wait for a free worker.
+    """
+    results = []
+    results_lock = threading.Lock()
+
+    def replay_one(record, scheduled_at):
+        behind_ms = (time.perf_counter() - scheduled_at) * 1000
+        if behind_ms > BEHIND_SCHEDULE_WARNING_MS:
+            print(f"⚠️ Dispatched {behind_ms:.0f} ms behind schedule (all {concurrency} workers busy?)")
+        url = base_url + (record.get('endpoint') or DEFAULT_ENDPOINT)
+        result = quack_replay_request(url, record['description'], timeout, scheduled_at)
+        with results_lock:
+            results.append(result)
+            done = len(results)
+        marker = "🦆" if result['status'] == 200 and not result['is_fallback'] else "🔄" if result['status'] == 200 else "❌"
+        print(f"{marker} [{done}/{len(schedule)}] {result['status']} {result['latency_ms']:.0f} ms")
+
+    replay_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for offset, record in schedule:
+            delay = offset - (time.perf_counter() - replay_start)
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(replay_one, record, replay_start + offset)
+
+    return results, time.perf_counter() - replay_start
+
+
+def parse_speed(value):
+    """Parse --speed: a positive multiplier such as 1, 10 or 2.5, or 'max'"""
+    if value.lower() == 'max':
+        return None
+    speed = float(value.lower().rstrip('x'))
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive or 'max'")
+    return speed
+
+
+def main():
+    """Main replay function"""
+    parser = argparse.ArgumentParser(description="Replay captured duck traffic against a duck generator")
+    parser.add_argument('logs', nargs='+', help="Capture log file(s), including rotated backups")
+    parser.add_argument('--url', default='http://localhost:8081', help="Base URL of the duck generator")
+    parser.add_argument('--speed', type=parse_speed, default=1.0, help="Replay speed: 1, 10 (or 10x), or 'max'")
+    parser.add_argument('--concurrency', type=int, default=32, help="Maximum requests in flight")
+    parser.add_argument('--timeout', type=float, default=30.0, help="Per-request client timeout in seconds")
+    parser.add_argument('--limit', type=int, default=None, help="Only replay the first N requests")
+    parser.add_argument('--json', action='store_true', help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    tracks = gather_duck_tracks(args.logs)
+    if args.limit is not None:
+        tracks = tracks[:args.limit]
+    schedule = plan_waddle_schedule(tracks, args.speed)
+    base_url = args.url.rstrip('/')
+    endpoints = sorted({record.get('endpoint') or DEFAULT_ENDPOINT for record in tracks})
+
+    captured_duration = schedule[-1][0] if schedule else 0.0
+    speed_label = "max" if args.speed is None else f"{args.speed:g}x"
+
+    print("\n" + "="*60)
+    print("🦆 DUCK TRAFFIC REPLAY")
+    print("="*60)
+    print(f"📊 Requests to replay: {len(schedule)}")
+    print(f"⏩ Speed: {speed_label} (planned duration {captured_duration:.1f}s)")
+    print(f"🔗 Target: {base_url} ({', '.join(endpoints)})")
+    print("="*60 + "\n")
+
+    if not schedule:
+        print("❌ No replayable requests found")
+        return
+
+    results, elapsed = waddle_replay(schedule, base_url, args.concurrency, args.timeout)
+    summary = summarize_flock(results)
+    summary["elapsed_s"] = round(elapsed, 2)
+    summary["captured_fallback_rate"] = summarize_flock([
+        {
+            "latency_ms": record.get('total_ms') or 0,
+            "status": record.get('status'),
+            "is_fallback": record.get('outcome') == 'fallback',
+        }
+        for record in tracks
+    ])["fallback_rate"]
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+
+    latency = summary["latency_ms"]
+    print("\n" + "="*60)
+    print("🎉 REPLAY COMPLETE!")
+    print("="*60)
+    print(f"✅ Succeeded: {summary['succeeded']}")
+    print(f"❌ Failed: {summary['failed']}")
+    print(f"⏱️  Elapsed: {summary['elapsed_s']}s")
+    queue_delay = summary["queue_delay_ms"]
+    print(f"📈 Latency ms: p50={latency['p50']} p90={latency['p90']} "
+          f"p95={latency['p95']} p99={latency['p99']} max={latency['max']}")
+    print(f"⏳ Queue delay ms: p50={queue_delay['p50']} p95={queue_delay['p95']} max={queue_delay['max']} "
+          f"({summary['behind_schedule']} requests behind schedule)")
+    print(f"🔄 Fallback rate: {summary['fallback_rate']} (captured: {summary['captured_fallback_rate']})")
+    print("="*60 + "\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Stub Nova Canvas MCP Server - Offline stand-in for awslabs.nova-canvas-mcp-server
+
+Serves a generate_image tool over stdio that waits a fixed latency and then
+writes canned duck PNGs to <workspace_dir>/output using the real server's
+file naming. Used by benchmark_duck_backends.py to measure the MCP backend's
+subprocess, JSON-RPC and filesystem overhead without calling AWS.
+
+Usage:
+    python3 stub_nova_canvas_mcp.py --latency 0.5
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import time
+
+try:
+    from mcp.server.mcpserver import MCPServer as StubServer
+except ImportError:
+    from mcp.server.fastmcp import FastMCP as StubServer
+
+from duck_backends import OUTPUT_DIR, name_fresh_clutch
+
+server = StubServer("stub-nova-canvas")
+
+stub_settings = {"latency": 0.0, "duck": None}
+
+
+@server.tool()
+def generate_image(prompt: str, workspace_dir: str, number_of_images: int = 1) -> str:
+    """Generate an image from a text prompt (stub: copies a canned duck)"""
+    if stub_settings["latency"]:
+        time.sleep(stub_settings["latency"])
+    output_dir = os.path.join(workspace_dir, 'output')
+    os.makedirs(output_dir, exist_ok=True)
+    clutch_name = name_fresh_clutch()
+    paths = []
+    for position in range(number_of_images):
+        path = os.path.join(output_dir, f"{clutch_name}_{position + 1}.png")
+        shutil.copyfile(stub_settings["duck"], path)
+        paths.append(path)
+    return "Generated images: " + ", ".join(paths)
+
+
+def main():
+    """Run the stub server over stdio"""
+    parser = argparse.ArgumentParser(description="Stub Nova Canvas MCP server")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds to wait per generate_image call")
+    parser.add_argument('--duck', default=None, help="PNG to hand out (defaults to a pond duck)")
+    args = parser.parse_args()
+    
+    stub_settings["latency"] = args.latency
+    stub_settings["duck"] = args.duck or sorted(glob.glob(os.path.join(OUTPUT_DIR, '*.png')))[0]
+    server.run()
+
+
+if __name__ == '__main__':
+    main()
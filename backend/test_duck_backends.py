@@ -0,0 +1,136 @@
+"""
+Generation backend tests for Duck Generator backend
+
+Tests the in-process Nova Canvas backend against the local Bedrock stub.
+"""
+
+import json
+import os
+import pytest
+import duck_agent
+from duck_backends import (
+    BedrockCanvasDuckBackend,
+    DuckBackend,
+    StubBedrockRuntime,
+    settle_pond_writer,
+    stash_clutch_async
+)
+from duck_deadline import HatchWatch
+from duck_ledger import read_duck_ledger
+from duck_metrics import pond_metrics
+from duck_traffic import DuckFootprints
+
+
+def hatch(backend, clutch_size=1):
+    footprints = DuckFootprints()
+    image_data = backend.hatch('a duck in space', clutch_size, footprints, HatchWatch(5))
+    settle_pond_writer()
+    return image_data, footprints
+
+
+class TestBedrockCanvasBackend:
+    """Test the in-process backend with a stubbed Bedrock client"""
+
+    def test_returns_primary_duck_from_memory(self, stub_backend):
+        """The requested duck is returned straight from the Bedrock response"""
+        image_data, footprints = hatch(stub_backend)
+
+        assert image_data.startswith('data:image/png;base64,')
+        assert 'canvas' in footprints.stages_ms
+
+    def test_persists_clutch_and_tags_surplus(self, stub_backend, pond):
+        """The whole clutch is written to the pond with extras tagged surplus"""
+        hatch(stub_backend, clutch_size=3)
+
+        ledger = read_duck_ledger(os.path.join(pond, 'duck_ledger.jsonl'))
+        assert len([name for name in os.listdir(pond) if name.endswith('.png')]) == 3
+        assert sorted(entry['surplus'] for entry in ledger.values()) == [False, True, True]
+        assert all(entry['prompt'] == 'a duck in space' for entry in ledger.values())
+
+    def test_persist_primary_off_keeps_only_surplus(self, pond, fake_png):
+        """With persist_primary off only the surplus ducks reach the pond"""
+        backend = BedrockCanvasDuckBackend(
+            client=StubBedrockRuntime(image_bytes=fake_png), output_dir=pond, persist_primary=False
+        )
+
+        hatch(backend, clutch_size=1)
+        assert not os.path.exists(pond)
+
+        hatch(backend, clutch_size=2)
+        assert len([name for name in os.listdir(pond) if name.endswith('.png')]) == 1
+
+    def test_late_clutch_is_kept_as_surplus(self, pond, fake_png):
+        """Ducks that arrive after the request gave up are all tagged surplus"""
+        watch = HatchWatch(5)
+
+        class AbandonedStub(StubBedrockRuntime):
+            def invoke_model(self, modelId, body, **kwargs):
+                watch.abandon('client_disconnected')
+                return super().invoke_model(modelId, body, **kwargs)
+
+        backend = BedrockCanvasDuckBackend(client=AbandonedStub(image_bytes=fake_png), output_dir=pond)
+        backend.hatch('a duck in space', 2, DuckFootprints(), watch)
+        settle_pond_writer()
+
+        ledger = read_duck_ledger(os.path.join(pond, 'duck_ledger.jsonl'))
+        assert [entry['surplus'] for entry in ledger.values()] == [True, True]
+
+    def test_sends_nova_canvas_request(self, pond, fake_png):
+        """The Bedrock request asks Nova Canvas for the whole clutch"""
+        class RecordingStub(StubBedrockRuntime):
+            def invoke_model(self, modelId, body, **kwargs):
+                self.request = (modelId, json.loads(body))
+                return super().invoke_model(modelId, body, **kwargs)
+
+        stub = RecordingStub(image_bytes=fake_png)
+        hatch(BedrockCanvasDuckBackend(client=stub, output_dir=pond), clutch_size=2)
+
+        model_id, request = stub.request
+        assert model_id == 'amazon.nova-canvas-v1:0'
+        assert request['taskType'] == 'TEXT_IMAGE'
+        assert 'duck' in request['textToImageParams']['text']
+        assert request['imageGenerationConfig']['numberOfImages'] == 2
+
+
+class TestPondWriter:
+    """Test the background pond writer"""
+
+    def test_failed_background_write_is_counted(self, tmp_path):
+        """A background write that fails is surfaced and counted"""
+        blocked = tmp_path / 'not_a_directory'
+        blocked.write_text('quack')
+        before = pond_metrics.snapshot().get('pond_write_errors', 0)
+
+        stashing = stash_clutch_async(['ZHVjaw=='], 'a duck', str(blocked))
+        settle_pond_writer()
+
+        assert stashing.exception() is not None
+        assert pond_metrics.snapshot()['pond_write_errors'] == before + 1
+
+
+class TestBackendSelection:
+    """Test backend selection in the generate endpoint"""
+
+    def test_backends_must_implement_hatch(self):
+        """A backend without hatch cannot be created"""
+        with pytest.raises(TypeError):
+            DuckBackend()
+
+    def test_unknown_backend_is_rejected(self):
+        """An unknown DUCK_BACKEND name is refused"""
+        with pytest.raises(ValueError):
+            duck_agent.summon_duck_backend('carrier-pigeon')
+
+    def test_endpoint_uses_selected_backend(self, client, stubbed_app):
+        """The generate endpoint hatches its duck with the selected backend"""
+        response = client.post('/api/duck/generate', json={'description': 'wearing a top hat'})
+        settle_pond_writer()
+
+        data = response.get_json()
+        assert response.status_code == 200
+        assert data['is_fallback'] is False
+        assert data['prompt_used'] == 'a duck wearing a top hat'
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,193 @@
+"""
+Shared Bedrock client tests for Duck Generator backend
+
+Tests the pooled client configuration, sharing and pool/retry metrics.
+"""
+
+import binascii
+import json
+import struct
+import boto3
+import pytest
+from botocore.awsrequest import AWSResponse
+from botocore.exceptions import ClientError
+from strands.types.exceptions import ModelThrottledException
+import duck_agent
+import duck_bedrock
+from duck_bedrock import (
+    summon_bedrock_config,
+    summon_bedrock_runtime,
+    summon_duck_agent,
+    watch_bedrock_pond
+)
+from duck_metrics import pond_metrics
+
+
+class CannedRaw:
+    """Minimal raw HTTP body for a canned botocore response"""
+
+    def __init__(self, body):
+        self.body = body
+
+    def stream(self, **kwargs):
+        yield self.body
+
+
+def canned_response(request, status, payload):
+    return AWSResponse(request.url, status, {'Content-Type': 'application/json'},
+                       CannedRaw(json.dumps(payload).encode('utf-8')))
+
+
+def canned_event(event_type, payload):
+    """Encode one AWS event stream message"""
+    headers = b''
+    for name, value in ((':event-type', event_type), (':content-type', 'application/json'),
+                        (':message-type', 'event')):
+        headers += bytes([len(name)]) + name.encode() + b'\x07' + struct.pack('>H', len(value)) + value.encode()
+    body = json.dumps(payload).encode('utf-8')
+    prelude = struct.pack('>II', 16 + len(headers) + len(body), len(headers))
+    message = prelude + struct.pack('>I', binascii.crc32(prelude)) + headers + body
+    return message + struct.pack('>I', binascii.crc32(message))
+
+
+def canned_stream(request, **kwargs):
+    return AWSResponse(request.url, 200, {'Content-Type': 'application/vnd.amazon.eventstream'},
+                       CannedRaw(canned_event('messageStop', {'stopReason': 'end_turn'})))
+
+
+@pytest.fixture
+def watched_client():
+    """A bedrock-runtime client with duck metrics and no real network"""
+    client = boto3.client(
+        'bedrock-runtime',
+        region_name='us-east-1',
+        aws_access_key_id='duck',
+        aws_secret_access_key='duck',
+        config=summon_bedrock_config(),
+    )
+    return watch_bedrock_pond(client)
+
+
+class TestBedrockConfig:
+    """Test the shared client configuration"""
+
+    def test_config_is_pooled_with_adaptive_retries(self):
+        """The shared config pools connections and retries adaptively within the deadline"""
+        config = summon_bedrock_config()
+
+        assert config.max_pool_connections == duck_bedrock.BEDROCK_POOL_SIZE
+        assert config.tcp_keepalive is True
+        assert config.retries['mode'] == 'adaptive'
+        assert config.retries['total_max_attempts'] == duck_bedrock.BEDROCK_MAX_ATTEMPTS
+        assert config.read_timeout < duck_agent.HATCH_DEADLINE
+
+    def test_shared_client_keeps_strands_user_agent(self):
+        """The shared client still identifies itself as Strands"""
+        assert 'strands-agents' in summon_bedrock_config().user_agent_extra
+
+    def test_agent_model_uses_shared_client(self):
+        """The agent's model reuses the one shared bedrock-runtime client"""
+        assert duck_agent.bedrock_model.client is summon_bedrock_runtime()
+        assert summon_bedrock_runtime() is summon_bedrock_runtime()
+
+
+class TestBedrockMetrics:
+    """Test call, retry and pool saturation counters"""
+
+    def test_retried_call_is_counted(self, watched_client):
+        """A call retried by botocore counts one call, two attempts and one retry"""
+        statuses = iter([500, 200])
+
+        def flaky_pond(request, **kwargs):
+            status = next(statuses)
+            payload = {"message": "ruffled"} if status == 500 else {"images": ["ZHVjaw=="]}
+            return canned_response(request, status, payload)
+
+        watched_client.meta.events.register('before-send.bedrock-runtime', flaky_pond)
+        before = pond_metrics.snapshot()
+
+        watched_client.invoke_model(modelId='amazon.nova-canvas-v1:0', body='{}')
+
+        after = pond_metrics.snapshot()
+        assert after.get('bedrock_calls', 0) - before.get('bedrock_calls', 0) == 1
+        assert after.get('bedrock_attempts', 0) - before.get('bedrock_attempts', 0) == 2
+        assert after.get('bedrock_retries', 0) - before.get('bedrock_retries', 0) == 1
+
+    def test_pool_saturation_is_counted(self, watched_client, monkeypatch):
+        """A call made with the pool full is counted as saturated"""
+        monkeypatch.setattr(duck_bedrock, 'BEDROCK_POOL_SIZE', 0)
+        watched_client.meta.events.register(
+            'before-send.bedrock-runtime',
+            lambda request, **kwargs: canned_response(request, 200, {"images": []})
+        )
+        before = pond_metrics.snapshot().get('bedrock_pool_saturated', 0)
+
+        watched_client.invoke_model(modelId='amazon.nova-canvas-v1:0', body='{}')
+
+        assert pond_metrics.snapshot()['bedrock_pool_saturated'] == before + 1
+
+    def test_http_error_is_counted(self, watched_client):
+        """A call that fails with an HTTP error is counted as a Bedrock error"""
+        watched_client.meta.events.register(
+            'before-send.bedrock-runtime',
+            lambda request, **kwargs: canned_response(request, 500, {"message": "ruffled"})
+        )
+        before = pond_metrics.snapshot().get('bedrock_errors', 0)
+
+        with pytest.raises(ClientError):
+            watched_client.invoke_model(modelId='amazon.nova-canvas-v1:0', body='{}')
+
+        assert pond_metrics.snapshot()['bedrock_errors'] == before + 1
+
+    def test_open_stream_stays_in_flight_until_read(self, watched_client, monkeypatch):
+        """A streaming response holds its pool slot until it has been read"""
+        monkeypatch.setattr(duck_bedrock, 'BEDROCK_POOL_SIZE', 1)
+
+        def canned_pond(request, **kwargs):
+            if 'converse-stream' in request.url:
+                return canned_stream(request)
+            return canned_response(request, 200, {"images": []})
+
+        watched_client.meta.events.register('before-send.bedrock-runtime', canned_pond)
+
+        def saturated():
+            return pond_metrics.snapshot().get('bedrock_pool_saturated', 0)
+
+        response = watched_client.converse_stream(modelId='us.amazon.nova-pro-v1:0', messages=[])
+        before = saturated()
+        watched_client.invoke_model(modelId='amazon.nova-canvas-v1:0', body='{}')
+        assert saturated() == before + 1
+
+        assert [list(event) for event in response['stream']] == [['messageStop']]
+        watched_client.invoke_model(modelId='amazon.nova-canvas-v1:0', body='{}')
+        assert saturated() == before + 1
+
+
+class TestAgentRetries:
+    """Test that agent-level retries don't stack on the client's"""
+
+    def test_duck_agent_does_not_retry_by_default(self, throttled_model, monkeypatch):
+        """With the default budget a throttled call is not retried by the agent"""
+        monkeypatch.setattr(duck_bedrock, 'AGENT_MAX_ATTEMPTS', 1)
+        model = throttled_model(1)
+        agent = summon_duck_agent(model=model, callback_handler=None)
+
+        with pytest.raises(ModelThrottledException):
+            agent("Quack")
+
+        assert model.calls == 1
+
+    def test_agent_retries_are_counted(self, throttled_model):
+        """Retries within a larger budget are made and counted as agent_retries"""
+        model = throttled_model(2)
+        agent = summon_duck_agent(max_attempts=3, retry_delay=0, model=model, callback_handler=None)
+        before = pond_metrics.snapshot().get('agent_retries', 0)
+
+        agent("Quack")
+
+        assert model.calls == 3
+        assert pond_metrics.snapshot()['agent_retries'] == before + 2
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,152 @@
+"""
+Server-side deadline and cancellation tests for Duck Generator backend
+
+Tests that abandoned generations are cancelled, reported and counted.
+"""
+
+import threading
+import time
+import pytest
+import duck_agent
+from duck_deadline import DuckCancelled, HatchWatch, await_hatching
+from duck_metrics import pond_metrics
+from duck_traffic import DuckFootprints
+
+
+class TestAwaitHatching:
+    """Test the worker/watch cancellation helpers"""
+
+    def test_returns_result_of_finished_work(self):
+        """Finished work returns its result"""
+        watch = HatchWatch(5)
+        assert await_hatching(lambda: "duck", watch, poll_interval=0.01) == "duck"
+
+    def test_propagates_work_errors(self):
+        """Errors raised by the work reach the caller"""
+        def broken_egg():
+            raise RuntimeError("cracked")
+
+        with pytest.raises(RuntimeError, match="cracked"):
+            await_hatching(broken_egg, HatchWatch(5), poll_interval=0.01)
+
+    def test_deadline_abandons_and_runs_hooks(self):
+        """Passing the deadline abandons the work and runs abandon hooks"""
+        watch = HatchWatch(0.05)
+        stopped = threading.Event()
+        watch.on_abandon(stopped.set)
+
+        with pytest.raises(DuckCancelled) as cancelled:
+            await_hatching(lambda: stopped.wait(2), watch, poll_interval=0.01)
+
+        assert cancelled.value.reason == 'deadline'
+        assert stopped.is_set()
+
+    def test_stage_timeout_names_the_stage(self):
+        """A stage timeout reports the stage it tripped in"""
+        watch = HatchWatch(5, {'agent': 0.05})
+
+        def slow_agent():
+            watch.enter_stage('agent')
+            watch.cancelled.wait(2)
+
+        with pytest.raises(DuckCancelled) as cancelled:
+            await_hatching(slow_agent, watch, poll_interval=0.01)
+
+        assert cancelled.value.reason == 'stage_timeout'
+        assert cancelled.value.stage == 'agent'
+
+    def test_client_disconnect_abandons(self):
+        """A disconnected client abandons the work"""
+        watch = HatchWatch(5)
+
+        with pytest.raises(DuckCancelled) as cancelled:
+            await_hatching(lambda: watch.cancelled.wait(2), watch, flew_away=lambda: True, poll_interval=0.01)
+
+        assert cancelled.value.reason == 'client_disconnected'
+
+    def test_enter_stage_after_abandon_stops_worker(self):
+        """Entering a stage after abandonment raises DuckCancelled"""
+        watch = HatchWatch(5)
+        watch.abandon('deadline')
+
+        with pytest.raises(DuckCancelled):
+            watch.enter_stage('extract')
+
+    def test_settled_work_is_not_abandoned(self):
+        """Once work has settled, a late abandon is a no-op"""
+        watch = HatchWatch(5)
+
+        assert watch.settle() is True
+        assert watch.abandon('deadline') is False
+        assert not watch.cancelled.is_set()
+
+    def test_abandoned_work_cannot_settle(self):
+        """Work finishing after abandonment does not count as settled"""
+        watch = HatchWatch(5)
+        watch.abandon('client_disconnected')
+
+        assert watch.settle() is False
+
+
+class TestHatchCounting:
+    """Test that every started generation is counted exactly once"""
+
+    def test_late_finish_is_not_counted_as_completed(self, monkeypatch):
+        """Work finishing after its request gave up counts as finished_after_cancel"""
+        class AbandonedBackend:
+            def hatch(self, prompt, clutch_size, footprints, watch):
+                watch.abandon('client_disconnected')
+                return "data:image/png;base64,ZHVjaw=="
+
+        monkeypatch.setattr(duck_agent, 'duck_backend', AbandonedBackend())
+        before = pond_metrics.snapshot()
+
+        duck_agent.hatch_duck_with_backend('a duck', DuckFootprints(), HatchWatch(5))
+
+        after = pond_metrics.snapshot()
+        assert after.get('hatch_completed', 0) == before.get('hatch_completed', 0)
+        assert after['hatch_finished_after_cancel'] == before.get('hatch_finished_after_cancel', 0) + 1
+
+    def test_sub_second_mcp_startup_timeout_rounds_up(self, monkeypatch):
+        """A 0.5 s MCP startup timeout becomes 1 s, never 0"""
+        seen = {}
+        monkeypatch.setitem(duck_agent.STAGE_TIMEOUTS, 'mcp_startup', 0.5)
+        monkeypatch.setattr(duck_agent, 'MCPClient', lambda factory, **kwargs: seen.update(kwargs))
+
+        duck_agent.summon_nova_canvas_client()
+
+        assert seen['startup_timeout'] == 1
+
+
+class TestEndpointDeadline:
+    """Test the generate endpoint's handling of an overdue generation"""
+
+    def test_overdue_generation_falls_back_and_is_counted(self, client, monkeypatch):
+        """An overdue generation returns a fallback duck and is counted"""
+        def stuck_duck(enhanced_description, footprints, watch):
+            watch.enter_stage('agent')
+            watch.cancelled.wait(2)
+            return ""
+
+        monkeypatch.setattr(duck_agent, 'hatch_duck_with_backend', stuck_duck)
+        monkeypatch.setattr(duck_agent, 'HATCH_DEADLINE', 0.1)
+        before = pond_metrics.snapshot().get('hatch_cancelled_deadline', 0)
+
+        started = time.monotonic()
+        response = client.post('/api/duck/generate', json={'description': 'a slow duck'})
+
+        assert time.monotonic() - started < 2
+        assert response.status_code == 200
+        assert response.get_json()['is_fallback'] is True
+        assert pond_metrics.snapshot()['hatch_cancelled_deadline'] == before + 1
+
+    def test_metrics_endpoint_returns_counters(self, client):
+        """The metrics endpoint returns the pond counters"""
+        response = client.get('/api/duck/metrics')
+
+        assert response.status_code == 200
+        assert isinstance(response.get_json(), dict)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
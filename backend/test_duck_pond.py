@@ -0,0 +1,127 @@
+"""
+Multi-image clutch and pond ledger tests for Duck Generator backend
+
+Tests surplus image planning, clutch discovery and prompt tagging.
+"""
+
+import json
+import os
+import time
+import pytest
+import duck_agent
+from duck_agent import plan_clutch_size, waddling_duck
+from duck_backends import find_hatched_clutch, read_duckling
+from duck_ledger import read_duck_ledger, tag_duck_in_ledger
+from conftest import FAKE_PNG
+
+
+def lay_egg(directory, name):
+    path = os.path.join(str(directory), name)
+    with open(path, 'wb') as f:
+        f.write(FAKE_PNG)
+    return path
+
+
+class TestClutchPlanning:
+    """Test how many images are requested per call"""
+
+    def test_surplus_requested_when_pond_is_quiet(self, monkeypatch):
+        """Surplus images are requested while few generations are in flight"""
+        monkeypatch.setattr(duck_agent, 'IMAGES_PER_CALL', 3)
+        monkeypatch.setattr(duck_agent, 'SURPLUS_MAX_IN_FLIGHT', 2)
+
+        assert plan_clutch_size(1) == 3
+        assert plan_clutch_size(2) == 3
+
+    def test_surplus_disabled_under_load(self, monkeypatch):
+        """Only one image is requested once the pond is busy"""
+        monkeypatch.setattr(duck_agent, 'IMAGES_PER_CALL', 3)
+        monkeypatch.setattr(duck_agent, 'SURPLUS_MAX_IN_FLIGHT', 2)
+
+        assert plan_clutch_size(3) == 1
+
+    def test_waddling_duck_counts_in_flight(self):
+        """In-flight count rises while waddling and falls afterwards"""
+        with waddling_duck() as first:
+            with waddling_duck() as second:
+                assert second == first + 1
+        with waddling_duck() as again:
+            assert again == first
+
+
+def canvas_conversation(tool_use_id, result_text, tool_name='generate_image'):
+    """Agent messages for one Nova Canvas tool call and its result"""
+    return [
+        {"role": "assistant", "content": [
+            {"toolUse": {"toolUseId": tool_use_id, "name": tool_name, "input": {}}}
+        ]},
+        {"role": "user", "content": [
+            {"toolResult": {"toolUseId": tool_use_id, "status": "success", "content": [{"text": result_text}]}}
+        ]},
+    ]
+
+
+class TestHatchedClutch:
+    """Test discovery of the images hatched by one agent's tool calls"""
+
+    def test_clutch_read_from_mcp_server_result(self, tmp_path):
+        """Image paths are read from the MCP server's JSON result"""
+        paths = [lay_egg(tmp_path, f'nova_canvas_abc_{n}.png') for n in (1, 2, 3)]
+        result = json.dumps({"status": "success", "paths": [f"file://{path}" for path in paths]})
+
+        clutch = find_hatched_clutch(canvas_conversation('t1', result))
+
+        assert clutch == paths
+
+    def test_clutch_read_from_stub_server_result(self, tmp_path):
+        """Image paths are read from the stub server's text result"""
+        paths = [lay_egg(tmp_path, f'nova_canvas_abc_{n}.png') for n in (1, 2)]
+
+        clutch = find_hatched_clutch(canvas_conversation('t1', "Generated images: " + ", ".join(paths)))
+
+        assert clutch == paths
+
+    def test_clutch_ignores_concurrent_generations(self, tmp_path):
+        """Only images named in this agent's tool result are claimed"""
+        mine = lay_egg(tmp_path, 'nova_canvas_mine_1.png')
+        theirs = lay_egg(tmp_path, 'nova_canvas_theirs_1.png')
+        os.utime(theirs, (time.time() + 5, time.time() + 5))
+
+        clutch = find_hatched_clutch(canvas_conversation('t1', f"Generated images: {mine}"))
+
+        assert clutch == [mine]
+        assert read_duckling(clutch[0]).startswith('data:image/png;base64,')
+
+    def test_other_tools_and_missing_files_are_ignored(self, tmp_path):
+        """Other tools' results and vanished files are skipped"""
+        other = lay_egg(tmp_path, 'not_a_canvas_duck.png')
+        messages = (
+            canvas_conversation('t1', f"Listed {other}", tool_name='list_files')
+            + canvas_conversation('t2', f"Generated images: {tmp_path}/nova_canvas_gone_1.png")
+        )
+
+        assert find_hatched_clutch(messages) == []
+
+
+class TestDuckLedger:
+    """Test prompt tagging of pond ducks"""
+
+    def test_tagged_ducks_can_be_read_back(self, tmp_path):
+        """Tagged ducks are read back with prompt and surplus flag"""
+        ledger = str(tmp_path / 'duck_ledger.jsonl')
+        tag_duck_in_ledger('/pond/nova_canvas_abc_1.png', 'a duck in space', ledger_path=ledger)
+        tag_duck_in_ledger('/pond/nova_canvas_abc_2.png', 'a duck in space', surplus=True, ledger_path=ledger)
+
+        entries = read_duck_ledger(ledger)
+
+        assert entries['nova_canvas_abc_1.png']['surplus'] is False
+        assert entries['nova_canvas_abc_2.png']['surplus'] is True
+        assert entries['nova_canvas_abc_2.png']['prompt'] == 'a duck in space'
+
+    def test_missing_ledger_is_empty(self, tmp_path):
+        """A missing ledger reads as empty"""
+        assert read_duck_ledger(str(tmp_path / 'missing.jsonl')) == {}
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,124 @@
+"""
+Streaming generate endpoint tests for Duck Generator backend
+
+Tests the NDJSON event stream and the nearest-duck preview lookup.
+"""
+
+import json
+import pytest
+import duck_agent
+from duck_backends import settle_pond_writer
+from duck_ledger import DuckLedgerIndex, find_nearest_duck, tag_duck_in_ledger
+
+
+def stream_events(client, description):
+    response = client.post('/api/duck/generate/stream', json={'description': description})
+    settle_pond_writer()
+    return response, [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+class TestDuckStream:
+    """Test the NDJSON streaming variant of the generate endpoint"""
+
+    def test_streams_prompt_preview_then_image(self, client, stubbed_app):
+        """The prompt and a preview duck arrive before the generated duck"""
+        response, events = stream_events(client, 'wearing a top hat')
+
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        assert [event['event'] for event in events] == ['prompt', 'preview', 'image']
+        assert events[0]['prompt_used'] == 'a duck wearing a top hat'
+        assert events[1]['is_fallback'] is True
+        assert events[2]['is_fallback'] is False
+        assert events[2]['image'].startswith('data:image/png;base64,')
+
+    def test_failed_generation_finishes_with_preview_duck(self, client, monkeypatch):
+        """A failed generation ends the stream with the preview duck as fallback"""
+        def broken_hatch(enhanced_description, footprints, watch):
+            raise RuntimeError("pond frozen")
+
+        monkeypatch.setattr(duck_agent, 'hatch_duck_with_backend', broken_hatch)
+
+        response, events = stream_events(client, 'a duck on ice')
+
+        assert [event['event'] for event in events] == ['prompt', 'preview', 'image']
+        assert events[2]['is_fallback'] is True
+        assert events[2]['image'] == events[1]['image']
+
+    def test_invalid_description_is_rejected_before_streaming(self, client):
+        """A blank description gets a plain 400 instead of a stream"""
+        response = client.post('/api/duck/generate/stream', json={'description': '   '})
+
+        assert response.status_code == 400
+        assert response.get_json()['success'] is False
+
+    @pytest.mark.parametrize('endpoint', ['/api/duck/generate', '/api/duck/generate/stream'])
+    @pytest.mark.parametrize('body', [
+        {'json': {'description': 123}},
+        {'json': ['description']},
+        {'data': '{not json', 'content_type': 'application/json'},
+    ])
+    def test_malformed_body_gets_duck_themed_400(self, client, endpoint, body):
+        """Unusable bodies get a duck-themed 400 from both endpoints"""
+        response = client.post(endpoint, **body)
+
+        assert response.status_code == 400
+        assert response.get_json()['error'].startswith('Quack!')
+
+
+class TestNearestDuck:
+    """Test the word-overlap preview lookup"""
+
+    def test_picks_closest_prompt(self):
+        """The duck whose prompt shares the most words is chosen"""
+        entries = [
+            {"file": "pirate.png", "prompt": "a duck dressed as a pirate"},
+            {"file": "astronaut.png", "prompt": "a duck astronaut floating in space"},
+        ]
+
+        nearest = find_nearest_duck("a duck in a space suit", entries)
+
+        assert nearest['file'] == 'astronaut.png'
+
+    def test_no_shared_words_means_no_match(self):
+        """Prompts sharing only common words are not a match"""
+        entries = [{"file": "pirate.png", "prompt": "a duck dressed as a pirate"}]
+
+        assert find_nearest_duck("a duck", entries) is None
+        assert find_nearest_duck("a wizard duck", entries) is None
+
+
+class TestDuckLedgerIndex:
+    """Test the in-memory ledger index used for previews"""
+
+    def test_index_picks_up_appended_ducks(self, tmp_path, fake_png):
+        """Ducks tagged after the index was built are found on the next lookup"""
+        ledger = str(tmp_path / 'duck_ledger.jsonl')
+        for name in ('pirate_1.png', 'wizard_1.png'):
+            (tmp_path / name).write_bytes(fake_png)
+        index = DuckLedgerIndex(ledger)
+
+        assert index.find_nearest('a pirate duck') is None
+
+        tag_duck_in_ledger(str(tmp_path / 'pirate_1.png'), 'a duck dressed as a pirate', ledger_path=ledger)
+        assert index.find_nearest('a pirate duck')['file'] == 'pirate_1.png'
+
+        tag_duck_in_ledger(str(tmp_path / 'wizard_1.png'), 'a wizard duck', ledger_path=ledger)
+        assert index.find_nearest('a wizard duck')['file'] == 'wizard_1.png'
+        assert len(index.refresh()) == 2
+
+    def test_index_skips_missing_files_and_dedupes_prompts(self, tmp_path, fake_png):
+        """Ducks whose files are gone are skipped and each prompt is indexed once"""
+        ledger = str(tmp_path / 'duck_ledger.jsonl')
+        (tmp_path / 'space_2.png').write_bytes(fake_png)
+        tag_duck_in_ledger(str(tmp_path / 'space_1.png'), 'a duck in space', ledger_path=ledger)
+        tag_duck_in_ledger(str(tmp_path / 'space_2.png'), 'a duck in space', surplus=True, ledger_path=ledger)
+        tag_duck_in_ledger(str(tmp_path / 'gone_1.png'), 'a duck on the moon', ledger_path=ledger)
+
+        entries = DuckLedgerIndex(ledger).refresh()
+
+        assert [entry['file'] for entry in entries] == ['space_2.png']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,159 @@
+"""
+Traffic capture and replay tests for Duck Generator backend
+
+Tests the opt-in capture log and the replay scheduling/reporting helpers.
+"""
+
+import json
+import threading
+import time
+import pytest
+from werkzeug.serving import make_server
+import duck_agent
+from duck_backends import StubCanvasDuckBackend, settle_pond_writer
+from duck_traffic import DuckFootprints, DuckTrafficRecorder
+from replay_duck_traffic import (
+    gather_duck_tracks,
+    plan_waddle_schedule,
+    quack_replay_request,
+    summarize_flock,
+    waddle_replay
+)
+
+
+@pytest.fixture
+def recorder(tmp_path):
+    """Create a recorder writing to a temporary capture log"""
+    recorder = DuckTrafficRecorder(str(tmp_path / 'duck_traffic.jsonl'), max_bytes=2048, backup_count=2)
+    yield recorder
+    recorder.close()
+
+
+def read_log(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class TestTrafficCapture:
+    """Test the capture log written by the traffic recorder"""
+
+    def test_footprints_record_stages_and_outcome(self, recorder):
+        """A fallback request is recorded with its stages and reason"""
+        footprints = DuckFootprints()
+        footprints.description = "a duck in space"
+        with footprints.waddle_stage('agent'):
+            pass
+        footprints.fallback_reason = "generation_error"
+
+        recorder.record_footprints(footprints, 200)
+        records = read_log(recorder.path)
+
+        assert len(records) == 1
+        assert records[0]['description'] == "a duck in space"
+        assert records[0]['outcome'] == 'fallback'
+        assert records[0]['fallback_reason'] == 'generation_error'
+        assert 'agent' in records[0]['stages_ms']
+        assert records[0]['total_ms'] >= 0
+
+    def test_capture_log_rotates(self, recorder, tmp_path):
+        """The capture log rotates once it exceeds its size limit"""
+        for i in range(50):
+            footprints = DuckFootprints()
+            footprints.description = f"duck number {i}"
+            recorder.record_footprints(footprints, 200)
+
+        assert (tmp_path / 'duck_traffic.jsonl.1').exists()
+
+    def test_endpoint_records_rejected_request(self, client, recorder, monkeypatch):
+        """Rejected generate requests are captured when capture is enabled"""
+        monkeypatch.setattr(duck_agent, 'traffic_recorder', recorder)
+
+        response = client.post('/api/duck/generate', json={'description': '   '})
+
+        assert response.status_code == 400
+        records = read_log(recorder.path)
+        assert records[-1]['outcome'] == 'rejected'
+        assert records[-1]['description'] == ''
+        assert records[-1]['endpoint'] == '/api/duck/generate'
+
+
+class TestTrafficReplay:
+    """Test replay scheduling and reporting"""
+
+    def test_schedule_preserves_inter_arrival_times(self, tmp_path):
+        """Offsets keep captured spacing, scaled by speed"""
+        log = tmp_path / 'duck_traffic.jsonl'
+        log.write_text("\n".join(json.dumps(r) for r in [
+            {"epoch": 104.0, "description": "third duck"},
+            {"epoch": 100.0, "description": "first duck"},
+            {"epoch": 101.0, "description": None},
+            {"epoch": 102.0, "description": "second duck"},
+        ]))
+        tracks = gather_duck_tracks([str(log)])
+
+        assert [r['description'] for r in tracks] == ["first duck", "second duck", "third duck"]
+        assert [offset for offset, _ in plan_waddle_schedule(tracks, 1.0)] == [0.0, 2.0, 4.0]
+        assert [offset for offset, _ in plan_waddle_schedule(tracks, 4.0)] == [0.0, 0.5, 1.0]
+        assert [offset for offset, _ in plan_waddle_schedule(tracks, None)] == [0.0, 0.0, 0.0]
+
+    def test_summary_reports_latency_and_fallback_rate(self):
+        """Summary includes percentiles and the fallback rate of successes"""
+        results = [
+            {"latency_ms": 100, "status": 200, "is_fallback": False},
+            {"latency_ms": 300, "status": 200, "is_fallback": True},
+            {"latency_ms": 200, "status": 200, "is_fallback": False},
+            {"latency_ms": 900, "status": 500, "is_fallback": False},
+        ]
+        summary = summarize_flock(results)
+
+        assert summary['succeeded'] == 3
+        assert summary['failed'] == 1
+        assert summary['fallback_rate'] == pytest.approx(1 / 3, abs=1e-3)
+        assert summary['latency_ms']['p50'] == 200
+        assert summary['latency_ms']['max'] == 900
+
+    def test_latency_counts_from_scheduled_time(self):
+        """Time spent queued behind busy workers is part of the latency"""
+        scheduled_at = time.perf_counter() - 0.5
+
+        result = quack_replay_request('http://127.0.0.1:9/api/duck/generate', 'a duck', 1, scheduled_at)
+
+        assert result['queue_delay_ms'] >= 500
+        assert result['latency_ms'] >= result['queue_delay_ms']
+
+    def test_summary_reports_queue_delay(self):
+        """Queue delay is summarized separately and late requests are counted"""
+        results = [
+            {"latency_ms": 150, "status": 200, "is_fallback": False, "queue_delay_ms": 0},
+            {"latency_ms": 900, "status": 200, "is_fallback": False, "queue_delay_ms": 750},
+        ]
+        summary = summarize_flock(results)
+
+        assert summary['queue_delay_ms']['max'] == 750
+        assert summary['behind_schedule'] == 1
+
+    def test_stub_backend_is_selectable(self):
+        """DUCK_BACKEND=stub serves canned ducks without AWS"""
+        assert duck_agent.summon_duck_backend('stub').name == 'stub'
+
+    def test_replay_uses_captured_endpoints_against_stub_server(self, pond, monkeypatch):
+        """Replay reaches both endpoints on a server running the stub backend"""
+        monkeypatch.setattr(duck_agent, 'duck_backend', StubCanvasDuckBackend(output_dir=pond))
+        server = make_server('127.0.0.1', 0, duck_agent.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        schedule = [
+            (0.0, {"description": "a duck in a hat"}),
+            (0.0, {"description": "a duck in a boat", "endpoint": "/api/duck/generate/stream"}),
+        ]
+        try:
+            results, _ = waddle_replay(schedule, f"http://127.0.0.1:{server.port}", 2, 10)
+        finally:
+            server.shutdown()
+            settle_pond_writer()
+
+        assert [r['status'] for r in results] == [200, 200]
+        assert not any(r['error'] or r['is_fallback'] for r in results)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
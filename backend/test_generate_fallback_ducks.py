@@ -0,0 +1,79 @@
+"""
+Batch generator context tests for Duck Generator backend
+
+Tests that the batch agent's conversation context stays bounded.
+"""
+
+import pytest
+from strands.agent.conversation_manager import SlidingWindowConversationManager
+import generate_fallback_ducks
+from generate_fallback_ducks import create_batch_agent, generate_duck, read_context_strategy
+
+
+class StubBatchAgent:
+    """Stand-in agent that remembers how much context each call saw"""
+
+    def __init__(self):
+        self.messages = []
+        self.context_seen = []
+        self.event_loop_metrics = type('Metrics', (), {'accumulated_usage': {'inputTokens': 0}})()
+
+    def __call__(self, prompt):
+        self.context_seen.append(len(self.messages))
+        self.messages.append({"role": "user", "content": [{"text": prompt}]})
+        self.messages.append({"role": "assistant", "content": [{"text": "Quack!"}]})
+        self.event_loop_metrics.accumulated_usage['inputTokens'] += 10 * len(self.messages)
+
+
+@pytest.fixture
+def no_waiting(monkeypatch):
+    """Skip the batch generator's file-write pause"""
+    monkeypatch.setattr(generate_fallback_ducks.time, 'sleep', lambda seconds: None)
+
+
+class TestContextStrategy:
+    """Test the reset and window context strategies"""
+
+    def test_reset_clears_messages_between_ducks(self, monkeypatch, no_waiting):
+        """Reset mode gives every duck an empty history"""
+        monkeypatch.setattr(generate_fallback_ducks, 'CONTEXT_STRATEGY', 'reset')
+        agent = StubBatchAgent()
+        call_stats = []
+
+        for index in range(3):
+            generate_duck(agent, f"duck number {index}", index, call_stats)
+
+        assert agent.context_seen == [0, 0, 0]
+        assert len({stat['input_tokens'] for stat in call_stats}) == 1
+
+    def test_window_uses_sliding_window_of_configured_size(self, monkeypatch):
+        """Window mode bounds the history to the configured size"""
+        monkeypatch.setattr(generate_fallback_ducks, 'CONTEXT_STRATEGY', 'window')
+        monkeypatch.setattr(generate_fallback_ducks, 'CONTEXT_WINDOW_SIZE', 3)
+
+        agent = create_batch_agent([], "You paint ducks.")
+
+        assert isinstance(agent.conversation_manager, SlidingWindowConversationManager)
+        assert agent.conversation_manager.window_size == 3
+
+    def test_batch_agent_rides_out_throttling(self, throttled_model, monkeypatch):
+        """The batch agent retries throttled calls on its own, larger budget"""
+        model = throttled_model(2)
+        monkeypatch.setattr(generate_fallback_ducks, 'bedrock_model', model)
+        monkeypatch.setattr(generate_fallback_ducks, 'BATCH_RETRY_DELAY', 0)
+
+        agent = create_batch_agent([], "You paint ducks.")
+        agent("Quack")
+
+        assert model.calls == 3
+
+    def test_unknown_strategy_is_rejected_when_read(self, monkeypatch):
+        """An unknown strategy is rejected as soon as it is read"""
+        monkeypatch.setenv('DUCK_CONTEXT_STRATEGY', 'forget-everything')
+
+        with pytest.raises(ValueError):
+            read_context_strategy()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])